@@ -4,6 +4,8 @@ import soundfile as sf
 from kokoro import KPipeline
 from pydub import AudioSegment
 
+from ..tuning.profile import apply_torch_threads
+
 class Kokoro_TTS:
     """
     A class for text-to-speech conversion using the Kokoro TTS model.
@@ -50,6 +52,7 @@ class Kokoro_TTS:
             lang_code (str): Language code for the TTS model.
             repo_id (str): Repository ID for the model.
         """
+        apply_torch_threads("tts")
         self.pipeline = KPipeline(
             lang_code=lang_code,
             repo_id=repo_id,
@@ -69,6 +72,8 @@ class Kokoro_TTS:
         """
         if self.pipeline is None or self.pipeline.lang_code != lang_code:
             self.initialize_pipeline(lang_code, repo_id)
+        # torch threads are process-wide; Whisper may have set its own since
+        apply_torch_threads("tts")
         
         # Generate, display, and save audio files in a loop
         generator = self.pipeline(
@@ -15,6 +15,7 @@ class AudioRecorder:
         self.recording = False
         self.audio_frames = []
         self.default_filename = "recording.mp3"
+        self.samplerate = 44100
 
     def audio_callback(self, indata, frames, time, status):
         if status:
@@ -24,6 +25,7 @@ class AudioRecorder:
 
     def start_recording(self, samplerate=44100, channels=1):
         self.audio_frames = []
+        self.samplerate = samplerate
         self.recording = True
 
         def record_thread():
@@ -60,7 +62,7 @@ class AudioRecorder:
         
         audio = AudioSegment(
             recorded_data.tobytes(),
-            frame_rate=44100,
+            frame_rate=self.samplerate,
             sample_width=2,
             channels=1
         )
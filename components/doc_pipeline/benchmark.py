@@ -0,0 +1,95 @@
+"""
+Benchmark the docling conversion profiles on sample documents.
+
+Every (document, profile) pair is converted in a fresh process so that peak
+RSS reflects that profile alone. Model loading is timed separately from the
+conversion itself.
+
+Usage:
+    python -m components.doc_pipeline.benchmark usage/Docs/abc.docx chapter.pdf
+    python -m components.doc_pipeline.benchmark chapter.pdf --profiles text tables
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .profiles import PROFILES, resolve_profile
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _convert_once(file_path, profile):
+    from docling.datamodel.base_models import InputFormat
+    from .profiles import get_converter
+
+    start = time.perf_counter()
+    converter = get_converter(profile)
+    if Path(file_path).suffix.lower() == ".pdf":
+        converter.initialize_pipeline(InputFormat.PDF)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = converter.convert(file_path)
+    convert_seconds = time.perf_counter() - start
+
+    pages = max(len(result.document.pages), 1)
+    return {
+        "load_s": load_seconds,
+        "convert_s": convert_seconds,
+        "pages": pages,
+        "s_per_page": convert_seconds / pages,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def run_benchmark(files, profiles):
+    """
+    Convert every file with every profile, each in its own process
+
+    Args:
+        files (list): Paths of the sample documents
+        profiles (list): Profile names, "auto" included
+
+    Returns:
+        list: One result dict per (file, profile)
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for file_path in files:
+        for profile in profiles:
+            resolved = resolve_profile(file_path, profile)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                stats = pool.submit(_convert_once, str(file_path), resolved).result()
+            stats.update({"file": Path(file_path).name, "profile": profile, "resolved": resolved})
+            results.append(stats)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark docling conversion profiles")
+    parser.add_argument("files", nargs="+", help="Sample PDF/DOCX/MD documents")
+    parser.add_argument(
+        "--profiles", nargs="+", default=[*PROFILES, "auto"],
+        choices=[*PROFILES, "auto"], help="Profiles to benchmark"
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.files, args.profiles)
+
+    header = f"{'file':<40} {'profile':<14} {'pages':>5} {'load s':>8} {'s/page':>8} {'peak RSS MB':>12}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        profile = row["profile"] if row["profile"] == row["resolved"] else f"auto->{row['resolved']}"
+        print(
+            f"{row['file'][:40]:<40} {profile:<14} {row['pages']:>5} "
+            f"{row['load_s']:>8.2f} {row['s_per_page']:>8.2f} {row['peak_rss_mb']:>12.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
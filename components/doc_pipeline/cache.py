@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "ADHYAYAN_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "adhyayan_mitra")
+)
+
+# Bumped when the exported markdown changes (2: page break markers)
+MARKDOWN_FORMAT = 2
+
+def file_sha256(file_path, block_size=1 << 20):
+    """
+    Hash the content of a file without reading it into memory at once.
+
+    Args:
+        file_path (str): Path to the file
+        block_size (int): Number of bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _docling_version():
+    try:
+        from importlib.metadata import version
+        return version("docling")
+    except Exception:
+        return "unknown"
+
+def text_key(*parts):
+    """
+    Build a cache key from strings, e.g. a prompt template and its input
+
+    Args:
+        *parts (str): Values that determine the cached result
+
+    Returns:
+        str: Hex digest identifying the combination
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+class ConversionCache:
+    """
+    On-disk, content-addressed cache for document -> markdown conversions.
+
+    Entries are keyed by the SHA-256 of the source file plus the converter
+    options, so the same chapter uploaded under a different name is still a
+    hit. The cache is capped in bytes and evicts least recently used entries
+    (an entry's mtime is refreshed on every hit).
+
+    The same store also holds section summaries (see get_summary_cache),
+    keyed with text_key instead of make_key.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024):
+        """
+        Initialize the conversion cache
+
+        Args:
+            cache_dir (str, optional): Directory holding the cached markdown files
+            max_bytes (int): Maximum total size of the cache before eviction
+        """
+        self.cache_dir = Path(cache_dir or os.path.join(DEFAULT_CACHE_DIR, "docling"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, file_path, options=None):
+        """
+        Build the cache key for a file and its converter options
+
+        Args:
+            file_path (str): Path to the source document
+            options (dict, optional): Converter options that affect the output
+
+        Returns:
+            str: Hex digest identifying the conversion
+        """
+        payload = json.dumps({
+            "content": file_sha256(file_path),
+            "options": options or {},
+            "docling": _docling_version(),
+            "format": MARKDOWN_FORMAT,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.md"
+
+    def get(self, key):
+        """
+        Look up a cached conversion
+
+        Args:
+            key (str): Key returned by make_key
+
+        Returns:
+            str or None: The cached markdown, or None on a miss
+        """
+        path = self._entry_path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)  # mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """
+        Store a conversion and evict old entries if the cache is over its cap
+
+        Args:
+            key (str): Key returned by make_key
+            text (str): The markdown to store
+        """
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.md"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        """Remove every cached entry."""
+        for path in self.cache_dir.glob("*.md"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Report cache usage
+
+        Returns:
+            dict: hits, misses, evictions, number of entries and total bytes
+        """
+        sizes = []
+        for path in self.cache_dir.glob("*.md"):
+            try:
+                sizes.append(path.stat().st_size)
+            except OSError:
+                continue
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(sizes),
+                "bytes": sum(sizes),
+            }
+
+_default_cache = None
+_summary_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """
+    Return the process-wide conversion cache, creating it on first use.
+
+    Returns:
+        ConversionCache: The shared cache instance
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ConversionCache()
+        return _default_cache
+
+def get_summary_cache():
+    """
+    Return the process-wide cache of section summaries, creating it on first use.
+
+    Returns:
+        ConversionCache: The shared summary cache instance
+    """
+    global _summary_cache
+    with _default_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = ConversionCache(os.path.join(DEFAULT_CACHE_DIR, "summaries"))
+        return _summary_cache
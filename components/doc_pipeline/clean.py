@@ -0,0 +1,155 @@
+import re
+from collections import Counter
+
+# Written between pages by the converter (see pipeline.py), so running
+# headers and footers can be told apart from body text
+PAGE_BREAK = "<!-- page break -->"
+
+HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+DATA_URI = re.compile(r"data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+")
+# "Page 12", "page 3 of 10", "3 of 10": page numbers wherever they are
+PAGE_LABEL = re.compile(r"^(page\s*\d{1,4}(\s*of\s*\d{1,4})?|\d{1,4}\s*of\s*\d{1,4})$", re.IGNORECASE)
+# A bare number is only a page number at a page edge (it may be a year)
+BARE_NUMBER = re.compile(r"^\d{1,4}$")
+EMPTY_TABLE_ROW = re.compile(r"^\|[\s|]*\|$")
+TABLE_SEPARATOR_CELL = re.compile(r"^:?-{3,}:?$")
+DIGITS = re.compile(r"\d+")
+STRUCTURAL_LINE = re.compile(r"^(#{1,6}\s|[-*+]\s|\d+[.)]\s|\||>|```)")
+
+def _normalize(line):
+    return line.strip().lower()
+
+def _edge_key(line):
+    # Running headers/footers differ only in their page number
+    return DIGITS.sub("#", _normalize(line))
+
+def _is_plain_text(line):
+    stripped = line.strip()
+    return bool(stripped) and not STRUCTURAL_LINE.match(stripped)
+
+def _compact_table_row(line):
+    cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+    cells = ["---" if TABLE_SEPARATOR_CELL.match(cell) else cell for cell in cells]
+    return "| " + " | ".join(cells) + " |"
+
+def _page_edges(lines, edge_lines):
+    # Indexes of the first and last edge_lines text lines of every page
+    # (none when the markdown has no page breaks)
+    if not any(line.strip() == PAGE_BREAK for line in lines):
+        return set()
+    edges = set()
+    page = []
+    for index, line in enumerate(lines + [PAGE_BREAK]):
+        if line.strip() == PAGE_BREAK:
+            edges.update(page[:edge_lines] + page[-edge_lines:])
+            page = []
+        elif _is_plain_text(line):
+            page.append(index)
+    return edges
+
+def clean_markdown(text, min_repeats=3, max_repeated_length=100, edge_lines=2):
+    """
+    Remove conversion artifacts from markdown before it reaches the LLM.
+
+    - HTML comments (docling's <!-- image --> placeholders), markdown images
+      and base64 data URIs
+    - Page labels ("Page 12", "3 of 10"), and bare numbers at the top or
+      bottom of min_repeats pages or more; a number inside the text, such as
+      a year on its own line, is kept
+    - Running page headers and footers: lines at a page edge that recur at
+      the edge of min_repeats pages or more, ignoring the numbers in them
+    - Short plain-text lines repeated verbatim min_repeats times or more
+      (watermarks such as "Reprint 2024-25"); the first occurrence is kept.
+      Lines that differ by a number ("Activity 1", "Activity 2") are not
+      repeats. Headings and list items are never dropped.
+    - Empty table rows, and the padding docling adds inside table cells
+    - Runs of blank lines
+
+    Page edges are known from the PAGE_BREAK markers written by the
+    converter; without them only verbatim repeats and page labels are removed.
+    The cleaning is deterministic: the same input always gives the same output.
+
+    Args:
+        text (str): Markdown produced by the converter
+        min_repeats (int): Occurrences after which a line counts as boilerplate
+        max_repeated_length (int): Longer lines are never treated as boilerplate
+        edge_lines (int): Text lines at the top and at the bottom of a page
+            checked for headers, footers and page numbers
+
+    Returns:
+        tuple: (cleaned markdown, number of lines removed)
+    """
+    text = MARKDOWN_IMAGE.sub("", text)
+    text = DATA_URI.sub("", text)
+    lines = text.splitlines()
+
+    edges = _page_edges(lines, edge_lines)
+    edge_pages = Counter()
+    for index in edges:
+        edge_pages[_edge_key(lines[index])] += 1
+    running = {
+        key for key, count in edge_pages.items()
+        if count >= min_repeats and len(key) <= max_repeated_length
+    }
+
+    counts = Counter(
+        _normalize(line) for line in lines
+        if _is_plain_text(line) and not BARE_NUMBER.match(line.strip())
+    )
+    repeated = {
+        key for key, count in counts.items()
+        if count >= min_repeats and len(key) <= max_repeated_length
+    }
+
+    # Drop comments (and the page breaks) without shifting line indexes
+    lines = HTML_COMMENT.sub(lambda match: "\n" * match.group(0).count("\n"), "\n".join(lines)).split("\n")
+
+    cleaned = []
+    seen = set()
+    removed = 0
+    in_code = False
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_code = not in_code
+        if in_code or stripped.startswith("```"):
+            cleaned.append(line.rstrip())
+            continue
+
+        if not stripped:
+            if cleaned and cleaned[-1] == "":
+                continue
+            cleaned.append("")
+            continue
+
+        if stripped.startswith("|"):
+            if EMPTY_TABLE_ROW.match(stripped) and "-" not in stripped:
+                removed += 1
+                continue
+            cleaned.append(_compact_table_row(stripped))
+            continue
+
+        if PAGE_LABEL.match(stripped):
+            removed += 1
+            continue
+
+        if index in edges and _edge_key(line) in running:
+            # Page numbers go entirely; a running header keeps its first occurrence
+            key = _edge_key(line)
+            if BARE_NUMBER.match(stripped) or key in seen:
+                removed += 1
+                continue
+            seen.add(key)
+            cleaned.append(line.rstrip())
+            continue
+
+        key = _normalize(line)
+        if key in repeated and _is_plain_text(line):
+            if key in seen:
+                removed += 1
+                continue
+            seen.add(key)
+        cleaned.append(line.rstrip())
+
+    return "\n".join(cleaned).strip(), removed
@@ -0,0 +1,44 @@
+import hashlib
+import re
+
+WHITESPACE = re.compile(r"\s+")
+
+def _fingerprint(paragraph):
+    normalized = WHITESPACE.sub(" ", paragraph).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def merge_documents(documents, min_length=40):
+    """
+    Merge several documents into one study corpus.
+
+    Paragraphs that already appeared in an earlier document (or earlier in
+    the same one) are dropped, comparing them case- and whitespace-
+    insensitively. Each document is introduced by a "# Source:" heading so
+    the LLM can attribute what it reads.
+
+    Args:
+        documents (list): (source name, markdown) pairs, in the order to merge
+        min_length (int): Shorter paragraphs (headings, labels) are never
+            treated as duplicates
+
+    Returns:
+        tuple: (merged markdown, number of duplicate paragraphs removed)
+    """
+    seen = set()
+    removed = 0
+    parts = []
+    for name, markdown in documents:
+        kept = []
+        for paragraph in re.split(r"\n\s*\n", markdown):
+            if not paragraph.strip():
+                continue
+            if len(paragraph.strip()) >= min_length:
+                fingerprint = _fingerprint(paragraph)
+                if fingerprint in seen:
+                    removed += 1
+                    continue
+                seen.add(fingerprint)
+            kept.append(paragraph.strip())
+        if kept:
+            parts.append(f"# Source: {name}\n\n" + "\n\n".join(kept))
+    return "\n\n".join(parts), removed
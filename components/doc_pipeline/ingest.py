@@ -0,0 +1,189 @@
+"""
+Batch document ingestion.
+
+Converts (and optionally summarizes) every PDF/DOCX/MD file in a directory
+across a pool of processes, fills the conversion cache on the way, and
+writes a JSON manifest describing each document.
+
+Usage:
+    python -m components.doc_pipeline.ingest syllabus/ --workers 4
+    python -m components.doc_pipeline.ingest syllabus/ --summarize --provider ollama
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .cache import file_sha256
+from .profiles import PROFILES
+
+SUPPORTED_SUFFIXES = ('.pdf', '.md', '.docx')
+
+def find_documents(directory, recursive=False):
+    """
+    List the supported documents in a directory
+
+    Args:
+        directory (str): Directory to scan
+        recursive (bool): Also scan subdirectories
+
+    Returns:
+        list: Sorted paths of PDF, DOCX and MD files
+    """
+    pattern = "**/*" if recursive else "*"
+    return sorted(
+        path for path in Path(directory).glob(pattern)
+        if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES
+    )
+
+def _set_llm(provider, model):
+    from ..select_llm import google_genai, ollama, llama_cpp, build_nvidia
+
+    if provider == "google_genai":
+        return google_genai.set_llm(**({"model": model} if model else {}))
+    if provider == "build_nvidia":
+        return build_nvidia.set_llm(
+            **({"model": model} if model else {}),
+            nvidia_api_key=os.getenv("NVIDIA_API_KEY")
+        )
+    if provider == "ollama":
+        return ollama.set_llm(**({"model": model} if model else {}))
+    if provider == "llama_cpp":
+        return llama_cpp.set_llm(**({"model_path": model} if model else {}))
+    raise ValueError(f"Unknown provider '{provider}'")
+
+def _init_worker(threads):
+    # Keep each worker's torch models from claiming every core
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+def ingest_document(file_path, output_dir, profile="auto", provider=None, model=None):
+    """
+    Convert, clean and optionally summarize one document
+
+    Args:
+        file_path (str): Path to the document
+        output_dir (str): Directory for the markdown outputs
+        profile (str): Conversion profile
+        provider (str, optional): LLM provider used to summarize. No summary if None.
+        model (str, optional): Model name (or GGUF path for llama_cpp)
+
+    Returns:
+        dict: Manifest record for the document
+    """
+    from .pipeline import DocumentProcessor
+    from .profiles import resolve_profile
+
+    path = Path(file_path)
+    record = {"file": str(path), "sha256": file_sha256(path)}
+    try:
+        llm = _set_llm(provider, model)[0] if provider else None
+        processor = DocumentProcessor(llm=llm, provider=provider, profile=profile)
+        record["profile"] = resolve_profile(path, profile)
+
+        start = time.perf_counter()
+        raw = processor.convert_to_markdown(path)
+        record["convert_s"] = round(time.perf_counter() - start, 3)
+
+        text = processor.clean_text(raw) if processor.clean else raw
+        record["tokens_raw"], record["tokens"] = processor.count_tokens_batch([raw, text])
+
+        stem = f"{path.stem}-{record['sha256'][:12]}"
+        markdown_path = Path(output_dir) / f"{stem}.md"
+        markdown_path.write_text(text, encoding="utf-8")
+        record["markdown_path"] = str(markdown_path)
+
+        if provider:
+            start = time.perf_counter()
+            result = processor.condense(text)
+            record["summarize_s"] = round(time.perf_counter() - start, 3)
+            record["result_tokens"] = processor.count_tokens(result)
+            result_path = Path(output_dir) / f"{stem}.result.md"
+            result_path.write_text(result, encoding="utf-8")
+            record["result_path"] = str(result_path)
+    except Exception as e:
+        record["error"] = str(e)
+    return record
+
+def ingest_directory(directory, output_dir, workers=2, profile="auto", provider=None, model=None,
+                     recursive=False, threads_per_worker=None):
+    """
+    Ingest every document of a directory across a process pool
+
+    Args:
+        directory (str): Directory holding the documents
+        output_dir (str): Directory for the markdown outputs
+        workers (int): Number of worker processes
+        profile (str): Conversion profile
+        provider (str, optional): LLM provider used to summarize
+        model (str, optional): Model name (or GGUF path for llama_cpp)
+        recursive (bool): Also scan subdirectories
+        threads_per_worker (int, optional): torch threads per worker process
+
+    Returns:
+        list: Manifest records, in file order
+    """
+    files = find_documents(directory, recursive)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    records = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+        futures = {
+            pool.submit(ingest_document, str(path), output_dir, profile, provider, model): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            record = future.result()
+            records[futures[future]] = record
+            status = f"error: {record['error']}" if "error" in record else f"{record['tokens']} tokens"
+            print(f"[{len(records)}/{len(files)}] {futures[future].name}: {status}")
+    return [records[path] for path in files]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-ingest a directory of study documents")
+    parser.add_argument("directory", help="Directory of PDF/DOCX/MD files")
+    parser.add_argument("--output-dir", default="ingested", help="Where converted markdown is written")
+    parser.add_argument("--manifest", default=None, help="Manifest path (default: <output-dir>/manifest.json)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--profile", default="auto", choices=[*PROFILES, "auto"])
+    parser.add_argument("--recursive", action="store_true")
+    parser.add_argument("--summarize", action="store_true", help="Also run the summarization stage")
+    parser.add_argument("--provider", default="ollama",
+                        choices=["google_genai", "build_nvidia", "ollama", "llama_cpp"])
+    parser.add_argument("--model", default=None, help="Model name, or GGUF path for llama_cpp")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    records = ingest_directory(
+        args.directory, args.output_dir,
+        workers=args.workers,
+        profile=args.profile,
+        provider=args.provider if args.summarize else None,
+        model=args.model,
+        recursive=args.recursive,
+        threads_per_worker=args.threads_per_worker,
+    )
+    manifest = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "directory": str(Path(args.directory).resolve()),
+        "workers": args.workers,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+        "documents": records,
+    }
+    manifest_path = Path(args.manifest or Path(args.output_dir) / "manifest.json")
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    print(f"Manifest written to {manifest_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,63 @@
 from pathlib import Path
 import re
-from transformers import AutoTokenizer
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from langchain_core.prompts import PromptTemplate
-from docling.document_converter import DocumentConverter
-from ..select_llm import llama_cpp, ollama
+from ..select_llm import client
+import threading
+from .cache import get_default_cache, get_summary_cache, text_key
+from .sections import split_sections, split_by_headings
+from . import tokens
+from .profiles import get_converter, resolve_profile
+from .clean import clean_markdown, PAGE_BREAK
+from .corpus import merge_documents
 # from .doc_ex import ex_summarized_text, ex_text
 
+def _pdf_page_count(path):
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(str(path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def _convert_in_worker(file_path, profile):
+    return get_converter(profile).convert(file_path).document.export_to_markdown(page_break_placeholder=PAGE_BREAK)
+
+# Conversion worker processes are kept between calls: each one loads the
+# docling models once, not once per upload
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _conversion_pool(max_workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < max_workers or getattr(_pool, "_broken", False):
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            _pool_workers = max_workers
+        return _pool
+
 class DocumentProcessor:
     """
     A class that handles document processing pipeline including:
-    - Converting documents to markdown
+    - Converting documents to markdown (cached on disk by content hash)
+    - Cleaning conversion artifacts out of the markdown
     - Counting tokens
-    - Summarizing content
+    - Summarizing content (section by section above max_tokens, with map-reduce
+      for long documents; section summaries are stored by content hash and
+      sections end at content-defined heading blocks, so a revised upload only
+      re-summarizes the sections around the edits)
+    - Streaming conversion of large PDFs in page windows
+    - Merging several documents into one de-duplicated corpus
     """
     
-    def __init__(self, llm, provider, model_name="Qwen/Qwen2.5-0.5B-Instruct", max_tokens=2000):
+    def __init__(self, llm, provider, model_name="Qwen/Qwen2.5-0.5B-Instruct", max_tokens=2000,
+                 use_cache=True, cache=None, single_pass_tokens=5000, section_tokens=1500,
+                 max_workers=4, map_reduce=True, profile="auto", clean=True):
         """
         Initialize the document processor with specified parameters
         
@@ -23,9 +66,35 @@ class DocumentProcessor:
             provider: The provider for the language model
             model_name (str): The name of the tokenizer model to use
             max_tokens (int): Maximum number of tokens allowed before summarization
+            use_cache (bool): Reuse stored conversions of identical files and stored
+                summaries of unchanged sections
+            cache (ConversionCache, optional): Cache to use. Defaults to the process-wide cache.
+            single_pass_tokens (int): Largest document summarized with a single LLM call
+            section_tokens (int): Maximum tokens per section in map-reduce mode
+            max_workers (int): Number of sections summarized concurrently
+            map_reduce (bool): Summarize documents above max_tokens section by section,
+                and map-reduce those above single_pass_tokens instead of rejecting them
+            profile (str): Conversion profile ("text", "tables", "ocr"), or "auto" to pick
+                one based on whether a PDF has a text layer
+            clean (bool): Strip repeated lines, images and table noise from the markdown
+                before it is counted and sent to the LLM
         """
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model_name = model_name
         self.max_tokens = max_tokens
+        self.single_pass_tokens = single_pass_tokens
+        self.section_tokens = section_tokens
+        self.max_workers = max_workers
+        self.map_reduce = map_reduce
+
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        self.summary_cache = get_summary_cache() if use_cache else None
+        self.section_stats = {"summarized": 0, "reused": 0}
+        self._stats_lock = threading.Lock()
+        self.profile = profile
+        self.clean = clean
+        self.clean_stats = None
+        self.duplicates_removed = 0
+        self.conversion_errors = {}
         
         self.llm = llm
         self.provider = provider
@@ -91,6 +160,23 @@ Make sure to enclose the Markdown content in triple backticks.(```markdown conte
    - Maintain consistent formatting throughout the document
 """
         self.summarize_prompt = PromptTemplate.from_template(self.summarize_template)
+
+        self.merge_template = """
+You are an expert educational content curator. The notes below are summaries of consecutive sections of ONE document, given in their original order.
+
+Merge them into a single, coherent study resource:
+   - Keep every definition, date, figure, example and key point from the section summaries
+   - Remove only content that is repeated across sections
+   - Unify the heading hierarchy (##, ###) so the result reads as one document
+   - Preserve the original order of topics
+
+SECTION SUMMARIES:
+{text}
+
+Content should be in Markdown format.
+Make sure to enclose the Markdown content in triple backticks.(```markdown content ```)
+"""
+        self.merge_prompt = PromptTemplate.from_template(self.merge_template)
     
     def convert_to_markdown(self, file_path=None):
         """
@@ -108,14 +194,176 @@ Make sure to enclose the Markdown content in triple backticks.(```markdown conte
             path = Path(file_path)
             
         if path.is_file() and path.suffix.lower() in ['.pdf', '.md', '.docx']:
-            converter = DocumentConverter()
-            result = converter.convert(path)
-            text = result.document.export_to_markdown()
-            return text
+            return self._convert(path, resolve_profile(path, self.profile))
         else:
             print("The file needs to be PDF, DOCX or MD format.")
             return ""
+
+    def _convert(self, path, profile, page_range=None):
+        options = {"profile": profile}
+        if page_range is not None:
+            options["page_range"] = list(page_range)
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(path, options)
+            text = self.cache.get(key)
+            if text is not None:
+                return text
+
+        converter = get_converter(profile)
+        if page_range is None:
+            result = converter.convert(path)
+        else:
+            result = converter.convert(path, page_range=page_range)
+        text = result.document.export_to_markdown(page_break_placeholder=PAGE_BREAK)
+
+        if key is not None:
+            self.cache.put(key, text)
+        return text
+
+    def convert_many(self, file_paths, max_workers=None, parallel_min_files=4):
+        """
+        Convert several documents to markdown, in parallel for larger batches.
+
+        Cached conversions are served directly. Fewer than parallel_min_files
+        remaining documents are converted one after another in this process,
+        whose converter is already loaded; larger batches go to a pool of
+        worker processes that is kept for later calls, so the total time is
+        close to that of the slowest document rather than the sum.
+
+        A document that fails to convert does not stop the others: its
+        markdown is "" and the error is recorded in conversion_errors.
+        
+        Args:
+            file_paths (list): Paths to the documents
+            max_workers (int, optional): Number of worker processes. Defaults to one per document.
+            parallel_min_files (int): Smallest number of documents converted in the process pool
+            
+        Returns:
+            list: Markdown of each document, in the same order ("" for unsupported or failed files)
+        """
+        paths = [Path(file_path) for file_path in file_paths]
+        results = [""] * len(paths)
+        self.conversion_errors = {}
+        pending = []
+        for index, path in enumerate(paths):
+            if not (path.is_file() and path.suffix.lower() in ['.pdf', '.md', '.docx']):
+                print(f"Skipping {path.name}: the file needs to be PDF, DOCX or MD format.")
+                continue
+            profile = resolve_profile(path, self.profile)
+            key = self.cache.make_key(path, {"profile": profile}) if self.cache is not None else None
+            text = self.cache.get(key) if key is not None else None
+            if text is not None:
+                results[index] = text
+            else:
+                pending.append((index, path, profile, key))
+
+        def failed(index, error):
+            self.conversion_errors[str(paths[index])] = str(error)
+            print(f"Error converting {paths[index].name}: {error}")
+
+        if len(pending) < parallel_min_files:
+            for index, path, profile, _ in pending:
+                try:
+                    results[index] = self._convert(path, profile)
+                except Exception as e:
+                    failed(index, e)
+        else:
+            pool = _conversion_pool(max_workers or len(pending))
+            futures = [
+                (index, key, pool.submit(_convert_in_worker, str(path), profile))
+                for index, path, profile, key in pending
+            ]
+            for index, key, future in futures:
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    failed(index, e)
+                    continue
+                if key is not None:
+                    self.cache.put(key, results[index])
+        return results
+
+    def iter_markdown(self, file_path, pages_per_window=10):
+        """
+        Convert a document to markdown one window of pages at a time.
+
+        Only the pages of the current window are held by the converter, so
+        peak memory depends on the window size rather than the page count.
+        Documents other than PDF, and PDFs that fit in one window, are
+        converted in a single step.
+
+        The joined windows are also stored under the whole-file cache key, and
+        a whole-file entry (from convert_to_markdown or the ingest CLI) is
+        served as one window, so both paths share one conversion per file.
+        
+        Args:
+            file_path (str): Path to the document
+            pages_per_window (int): Number of PDF pages converted per window
+            
+        Yields:
+            tuple: (start_page, end_page, page_count, markdown) for each window
+        """
+        path = Path(file_path)
+        if not (path.is_file() and path.suffix.lower() in ['.pdf', '.md', '.docx']):
+            print("The file needs to be PDF, DOCX or MD format.")
+            return
+
+        profile = resolve_profile(path, self.profile)
+        page_count = _pdf_page_count(path) if path.suffix.lower() == '.pdf' else 1
+        if page_count <= pages_per_window:
+            yield 1, page_count, page_count, self._convert(path, profile)
+            return
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(path, {"profile": profile})
+            text = self.cache.get(key)
+            if text is not None:
+                yield 1, page_count, page_count, text
+                return
+
+        windows = []
+        for start in range(1, page_count + 1, pages_per_window):
+            end = min(start + pages_per_window - 1, page_count)
+            windows.append(self._convert(path, profile, page_range=(start, end)))
+            yield start, end, page_count, windows[-1]
+
+        if key is not None:
+            self.cache.put(key, f"\n\n{PAGE_BREAK}\n\n".join(windows))
     
+    def clean_text(self, text):
+        """
+        Remove boilerplate and non-text artifacts from converted markdown.
+
+        The tokens saved are recorded in clean_stats.
+        
+        Args:
+            text (str): Markdown produced by the converter
+            
+        Returns:
+            str: The cleaned markdown
+        """
+        cleaned, lines_removed = clean_markdown(text)
+        self._record_clean_stats(text, cleaned, lines_removed)
+        return cleaned
+
+    def _record_clean_stats(self, raw, cleaned, lines_removed):
+        tokens_before, tokens_after = self.count_tokens_batch([raw, cleaned])
+        self.clean_stats = {
+            "lines_removed": lines_removed,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+        }
+        print(f"Cleaning saved {tokens_before - tokens_after} of {tokens_before} tokens.")
+
+    @property
+    def tokenizer(self):
+        """The process-wide tokenizer for model_name, loaded on first use."""
+        return tokens.get_tokenizer(self.model_name)
+
     def count_tokens(self, input_text):
         """
         Count the number of tokens in the input text
@@ -126,13 +374,48 @@ Make sure to enclose the Markdown content in triple backticks.(```markdown conte
         Returns:
             int: Number of tokens in the text
         """
-        tokens = self.tokenizer(input_text, return_tensors="pt")
-        num_tokens = len(tokens["input_ids"][0])
-        return num_tokens
+        return tokens.count_tokens(input_text, self.model_name)
+
+    def count_tokens_batch(self, texts):
+        """
+        Count the number of tokens in each of several texts at once
+        
+        Args:
+            texts (list): The texts to count tokens for
+            
+        Returns:
+            list: Number of tokens in each text
+        """
+        return tokens.count_tokens_batch(texts, self.model_name)
+
+    def estimate_tokens(self, input_text):
+        """
+        Approximate the number of tokens without running the tokenizer
+        
+        Args:
+            input_text (str): The text to estimate tokens for
+            
+        Returns:
+            int: Approximate number of tokens in the text
+        """
+        return tokens.estimate_tokens(input_text)
     
+    def _cached_summary(self, template, input_text, generate):
+        if self.summary_cache is None:
+            return generate(input_text)
+
+        key = text_key(template, self.provider, client.model_id(self.llm), input_text)
+        summary = self.summary_cache.get(key)
+        with self._stats_lock:
+            self.section_stats["reused" if summary is not None else "summarized"] += 1
+        if summary is None:
+            summary = generate(input_text)
+            self.summary_cache.put(key, summary)
+        return summary
+
     def summarize(self, input_text):
         """
-        Summarize the input text
+        Summarize the input text, reusing the stored summary of identical text
         
         Args:
             input_text (str): The text to summarize
@@ -140,19 +423,34 @@ Make sure to enclose the Markdown content in triple backticks.(```markdown conte
         Returns:
             str: Summarized text in markdown format
         """
-        chain = self.summarize_prompt | self.llm
-        text = chain.invoke({
+        return self._cached_summary(self.summarize_template, input_text, self._summarize)
+
+    def _summarize(self, input_text):
+        text = client.invoke(self.llm, self.provider, self.summarize_prompt, {
             # "ex_text": ex_text,
             # "ex_summarized_text": ex_summarized_text,
             "text": input_text
-        })
-
-        if self.provider == "google_genai":
-            text = text.content
-        elif self.provider == "llama_cpp":
-            text = text
-        elif self.provider == "ollama":
-            text = text
+        }, task="summarize")
+        return self._extract_markdown(text)
+
+    def merge_summaries(self, summaries):
+        """
+        Merge the summaries of consecutive sections into one document
+        
+        Args:
+            summaries (list): Section summaries in document order
+            
+        Returns:
+            str: Merged summary in markdown format
+        """
+        return self._cached_summary(self.merge_template, "\n\n---\n\n".join(summaries), self._merge)
+
+    def _merge(self, joined_summaries):
+        text = client.invoke(self.llm, self.provider, self.merge_prompt, {"text": joined_summaries},
+                             task="merge")
+        return self._extract_markdown(text)
+
+    def _extract_markdown(self, text):
         # Extract the markdown content from the response
         # This regex pattern assumes the markdown content is enclosed in triple backticks
         pattern = r"```markdown\n(.*?)$" 
@@ -162,13 +460,97 @@ Make sure to enclose the Markdown content in triple backticks.(```markdown conte
             text = result.group(1).strip()
         
         return text
+
+    def summarize_map_reduce(self, input_text):
+        """
+        Summarize a long document section by section.
+
+        Map: the markdown is split along its headings into sections of at most
+        section_tokens tokens, which are summarized concurrently by a pool of
+        max_workers threads. Reduce: the section summaries are merged in groups
+        that fit in single_pass_tokens until one summary remains.
+        
+        Args:
+            input_text (str): The text to summarize
+            
+        Returns:
+            str: Summarized text in markdown format
+        """
+        with ThreadPoolExecutor(max_workers=self._workers()) as pool:
+            return self._reduce(self._summarize_sections(input_text, pool), pool)
+
+    def summarize_sections(self, input_text):
+        """
+        Summarize a document section by section and splice the summaries in order.
+
+        Used for documents that fit in one pass but exceed max_tokens: each
+        section summary is cached on its own, so re-uploading a revised
+        document only summarizes the sections around the edits.
+        
+        Args:
+            input_text (str): The text to summarize
+            
+        Returns:
+            str: Summarized text in markdown format
+        """
+        with ThreadPoolExecutor(max_workers=self._workers()) as pool:
+            return "\n\n".join(self._summarize_sections(input_text, pool))
+
+    def _summarize_sections(self, input_text, pool):
+        sections = self._sections(input_text)
+        print(f"Summarizing {len(sections)} sections with {self._workers()} workers...")
+        summaries = list(pool.map(self.summarize, sections))
+        print(f"Sections summarized: {self.section_stats['summarized']}, "
+              f"reused from earlier uploads: {self.section_stats['reused']}")
+        return summaries
+
+    def _workers(self):
+        # A LlamaCpp instance holds a single context and cannot serve
+        # concurrent calls, so local inference runs the sections in sequence.
+        return 1 if self.provider == "llama_cpp" else self.max_workers
+
+    def _sections(self, text):
+        return split_sections(
+            text, self.count_tokens, self.section_tokens, count_batch=self.count_tokens_batch
+        )
+
+    def _reduce(self, summaries, pool):
+        if len(summaries) == 1:
+            return summaries[0]
+
+        groups = self._group_summaries(summaries)
+        if len(groups) == len(summaries):
+            # Every summary already fills a reduce call on its own; merging
+            # further would only truncate content, so splice them in order.
+            return "\n\n".join(summaries)
+
+        merged = list(pool.map(
+            lambda group: group[0] if len(group) == 1 else self.merge_summaries(group),
+            groups
+        ))
+        return self._reduce(merged, pool)
+
+    def _group_summaries(self, summaries):
+        groups = []
+        current = []
+        current_tokens = 0
+        for summary, summary_tokens in zip(summaries, self.count_tokens_batch(summaries)):
+            if current and current_tokens + summary_tokens > self.single_pass_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += summary_tokens
+        if current:
+            groups.append(current)
+        return groups
     
     def process_document(self, file_path=None):
         """
         Process a document through the entire pipeline:
         1. Convert to markdown
-        2. Check token count
-        3. Summarize if needed
+        2. Clean conversion artifacts
+        3. Check token count
+        4. Summarize if needed (section by section, merged above single_pass_tokens)
         
         Args:
             file_path (str, optional): Path to the document. If None, will prompt user for input.
@@ -177,19 +559,155 @@ Make sure to enclose the Markdown content in triple backticks.(```markdown conte
             str: Processed document content or error message
         """
         text = self.convert_to_markdown(file_path)
-        token_count = self.count_tokens(text)
+        if self.clean:
+            text = self.clean_text(text)
+        return self.condense(text)
+
+    def process_documents(self, file_paths, names=None, max_workers=None):
+        """
+        Process several documents as one study corpus:
+        1. Convert them (in parallel for larger batches); failed files are skipped
+        2. Clean each of them
+        3. Drop paragraphs repeated across documents and merge them with source headings
+        4. Summarize the corpus if needed
+        
+        Args:
+            file_paths (list): Paths to the documents
+            names (list, optional): Source names shown in the corpus. Defaults to the file names.
+            max_workers (int, optional): Number of conversion worker processes
+            
+        Returns:
+            str: Processed corpus content or error message
+        """
+        names = names or [Path(file_path).name for file_path in file_paths]
+        converted = self.convert_many(file_paths, max_workers)
+        # Documents that failed to convert are left out of the corpus
+        sources = [(name, text) for name, text in zip(names, converted) if text]
+        names = [name for name, _ in sources]
+        raw_texts = [text for _, text in sources]
+        texts = raw_texts
+        if self.clean:
+            cleaned = [clean_markdown(text) for text in raw_texts]
+            texts = [text for text, _ in cleaned]
+            self._record_clean_stats(
+                "\n\n".join(raw_texts),
+                "\n\n".join(texts),
+                sum(removed for _, removed in cleaned)
+            )
+        corpus, self.duplicates_removed = merge_documents(list(zip(names, texts)))
+        print(f"Merged {len(texts)} documents, removed {self.duplicates_removed} duplicate paragraphs.")
+        return self.condense(corpus)
+
+    def condense(self, text):
+        """
+        Apply the summarization thresholds to converted markdown
         
-        if token_count > 5000:
-            return f"Text is Too large to process {token_count} Tokens"
-        elif token_count > 2000 and token_count <= 5000:
-            print(f"Document has {token_count} tokens. Summarizing...")
-            text = self.summarize(text)
+        Args:
+            text (str): The document content in markdown format
+            
+        Returns:
+            str: Raw text, its summary, or an error message
+        """
+        # The estimate settles the thresholds unless the text is close to one
+        token_count = self.estimate_tokens(text)
+        
+        if tokens.exceeds(text, self.single_pass_tokens, self.model_name):
+            if not self.map_reduce:
+                return f"Text is Too large to process {self.count_tokens(text)} Tokens"
+            print(f"Document has ~{token_count} tokens. Summarizing in sections...")
+            text = self.summarize_map_reduce(text)
+        elif tokens.exceeds(text, self.max_tokens, self.model_name):
+            print(f"Document has ~{token_count} tokens. Summarizing...")
+            text = self.summarize_sections(text) if self.map_reduce else self.summarize(text)
         else:
-            # For documents with <= 2000 tokens, use the raw text
-            print(f"Document has {token_count} tokens. Using raw document.")
+            # For documents with <= max_tokens tokens, use the raw text
+            print(f"Document has ~{token_count} tokens. Using raw document.")
             
         return text
 
+    def stream_document(self, file_path, pages_per_window=10):
+        """
+        Process a document while it is being converted.
+
+        Markdown is yielded window by window as the pages are converted. As soon
+        as the converted text is known to need map-reduce summarization, every
+        completed section is handed to the summarization pool, so the map phase
+        runs while later pages are still converting.
+
+        Those early sections come from per-window cleaning and are only a head
+        start: once conversion ends, the whole text is cleaned and sectioned
+        exactly as process_document does, early summaries are reused for the
+        sections that came out identical and the others are summarized then.
+        The result, and the summary cache entries, therefore match
+        process_document on the same conversion.
+        
+        Args:
+            file_path (str): Path to the document
+            pages_per_window (int): Number of PDF pages converted per window
+            
+        Yields:
+            dict: {"type": "window", "start_page", "end_page", "page_count", "markdown"}
+            for every converted window, then one {"type": "result", "text"} with the
+            same final text process_document would return
+        """
+        raw_windows = []
+        early = {}
+        pending = ""
+        converted_tokens = 0
+        summarizing = False
+
+        pool = ThreadPoolExecutor(max_workers=self._workers())
+        try:
+            for start, end, page_count, markdown in self.iter_markdown(file_path, pages_per_window):
+                raw_windows.append(markdown)
+                if self.clean:
+                    markdown, _ = clean_markdown(markdown)
+                yield {
+                    "type": "window",
+                    "start_page": start,
+                    "end_page": end,
+                    "page_count": page_count,
+                    "markdown": markdown,
+                }
+                if not self.map_reduce:
+                    continue
+
+                pending = f"{pending}\n\n{markdown}" if pending else markdown
+                converted_tokens += self.estimate_tokens(markdown)
+                if not summarizing and converted_tokens > self.single_pass_tokens:
+                    print("Document exceeds the single-pass limit. Summarizing sections as they convert...")
+                    summarizing = True
+                if summarizing:
+                    # The last heading block may continue in the next window, and the
+                    # last packed section may still absorb the blocks that follow
+                    blocks = split_by_headings(pending)
+                    pending = blocks.pop() if blocks else ""
+                    sections = self._sections("\n\n".join(blocks)) if blocks else []
+                    if sections:
+                        last = sections.pop()
+                        pending = f"{last}\n\n{pending}" if pending else last
+                    for section in sections:
+                        if section not in early:
+                            early[section] = pool.submit(self.summarize, section)
+
+            # From here on, the same steps as process_document
+            raw = f"\n\n{PAGE_BREAK}\n\n".join(raw_windows)
+            text = self.clean_text(raw) if self.clean else raw
+            if self.map_reduce and tokens.exceeds(text, self.single_pass_tokens, self.model_name):
+                sections = self._sections(text)
+                futures = [early.get(section) or pool.submit(self.summarize, section) for section in sections]
+                reused = sum(section in early for section in sections)
+                print(f"Summarizing {len(sections)} sections ({reused} started during conversion)...")
+                summaries = [future.result() for future in futures]
+                text = self._reduce(summaries, pool)
+                print(f"Sections summarized: {self.section_stats['summarized']}, "
+                      f"reused from earlier uploads: {self.section_stats['reused']}")
+            else:
+                text = self.condense(text)
+            yield {"type": "result", "text": text}
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
 # Usage example
 # if __name__ == "__main__":
 #     processor = DocumentProcessor()
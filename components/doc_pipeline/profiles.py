@@ -0,0 +1,92 @@
+import threading
+from pathlib import Path
+
+# Conversion profiles for the docling PDF pipeline, from cheapest to most
+# thorough. DOCX and MD files never go through layout/OCR models, so the
+# profile only changes how PDFs are converted.
+PROFILES = {
+    "text": {"do_ocr": False, "do_table_structure": False},
+    "tables": {"do_ocr": False, "do_table_structure": True},
+    "ocr": {"do_ocr": True, "do_table_structure": True},
+}
+
+_converters = {}
+_lock = threading.Lock()
+
+def has_text_layer(file_path, sample_pages=3, min_chars=200):
+    """
+    Check whether a PDF is born-digital, i.e. has extractable text.
+
+    Args:
+        file_path (str): Path to the PDF
+        sample_pages (int): Number of leading pages to inspect
+        min_chars (int): Characters needed across the sampled pages
+
+    Returns:
+        bool: True if the sampled pages carry a text layer
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(str(file_path))
+    try:
+        chars = 0
+        for index in range(min(sample_pages, len(pdf))):
+            textpage = pdf[index].get_textpage()
+            chars += len(textpage.get_text_range().strip())
+            textpage.close()
+            if chars >= min_chars:
+                return True
+        return False
+    finally:
+        pdf.close()
+
+def resolve_profile(file_path, profile="auto"):
+    """
+    Pick the conversion profile for a document
+
+    Args:
+        file_path (str): Path to the document
+        profile (str): "auto" or one of PROFILES
+
+    Returns:
+        str: The profile name to convert with
+    """
+    if profile != "auto":
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown conversion profile '{profile}'. Choose from {list(PROFILES)} or 'auto'.")
+        return profile
+
+    if Path(file_path).suffix.lower() != ".pdf":
+        return "text"
+    # Born-digital PDFs (most NCERT chapters) only need table structure;
+    # scanned ones need OCR to produce any text at all.
+    return "tables" if has_text_layer(file_path) else "ocr"
+
+def get_converter(profile="tables"):
+    """
+    Return the process-wide DocumentConverter for a profile.
+
+    Converters load their layout/OCR models lazily on first use, so keeping
+    one instance per profile avoids paying that cost per upload.
+
+    Args:
+        profile (str): One of PROFILES
+
+    Returns:
+        DocumentConverter: The converter configured for the profile
+    """
+    with _lock:
+        converter = _converters.get(profile)
+        if converter is None:
+            from docling.datamodel.base_models import InputFormat
+            from docling.datamodel.pipeline_options import PdfPipelineOptions
+            from docling.document_converter import DocumentConverter, PdfFormatOption
+
+            pipeline_options = PdfPipelineOptions(**PROFILES[profile])
+            converter = DocumentConverter(
+                format_options={
+                    InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+                }
+            )
+            _converters[profile] = converter
+        return converter
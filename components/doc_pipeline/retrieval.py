@@ -0,0 +1,174 @@
+import math
+import re
+from collections import Counter
+
+from .sections import split_sections
+from . import tokens
+
+DEFAULT_CONTEXT_BUDGET = 1500
+
+WORD = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they
+this those through to too under until up very was we were what when where which while who whom
+why will with you your yours yourself yourselves
+""".split())
+
+def _terms(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+class DocumentIndex:
+    """
+    BM25 index over the sections of one document.
+
+    The index is built once per document; each pipeline stage then retrieves
+    only the sections relevant to its own inputs (transcript, gaps, answers)
+    instead of sending the whole document in every prompt.
+    """
+
+    def __init__(self, text, chunk_tokens=300, model_name=tokens.DEFAULT_TOKENIZER, k1=1.5, b=0.75):
+        """
+        Build the index
+
+        Args:
+            text (str): The document in markdown format
+            chunk_tokens (int): Maximum tokens per indexed section
+            model_name (str): Tokenizer used to measure sections
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 length normalization
+        """
+        self.text = text
+        self.model_name = model_name
+        self.k1 = k1
+        self.b = b
+
+        count = lambda chunk: tokens.count_tokens(chunk, model_name)
+        count_batch = lambda chunks: tokens.count_tokens_batch(chunks, model_name)
+        self.chunks = split_sections(text, count, chunk_tokens, count_batch=count_batch)
+        self.chunk_tokens = count_batch(self.chunks)
+        self.total_tokens = sum(self.chunk_tokens)
+
+        self.term_freqs = [Counter(_terms(chunk)) for chunk in self.chunks]
+        self.lengths = [sum(freqs.values()) for freqs in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+
+        doc_freqs = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        n = len(self.chunks)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def scores(self, query):
+        """
+        Score every section against a query
+
+        Args:
+            query (str): Free text to match against the sections
+
+        Returns:
+            list: BM25 score of each section, in document order
+        """
+        query_terms = Counter(_terms(query))
+        scores = []
+        for freqs, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            score = 0.0
+            for term, query_count in query_terms.items():
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm) * query_count
+            scores.append(score)
+        return scores
+
+    def retrieve(self, query, token_budget=DEFAULT_CONTEXT_BUDGET, k=None):
+        """
+        Select the sections most relevant to a query within a token budget.
+
+        Sections are picked by descending score until the budget is used,
+        then returned in their original order so the context still reads
+        like the document. If the whole document fits, it is returned as is.
+
+        Args:
+            query (str): Free text describing what the stage needs
+            token_budget (int): Maximum tokens of context to return
+            k (int, optional): Maximum number of sections to return
+
+        Returns:
+            str: The selected sections joined as markdown
+        """
+        if self.total_tokens <= token_budget:
+            return self.text
+
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.chunks)), key=lambda i: (-scores[i], i))
+        selected = []
+        used = 0
+        for index in ranked:
+            if k is not None and len(selected) >= k:
+                break
+            if used + self.chunk_tokens[index] > token_budget:
+                continue
+            selected.append(index)
+            used += self.chunk_tokens[index]
+
+        return "\n\n".join(self.chunks[i] for i in sorted(selected))
+
+def select_context(doc_result, doc_index=None, query="", token_budget=None):
+    """
+    Return the document context for a prompt.
+
+    Args:
+        doc_result (str): The full processed document
+        doc_index (DocumentIndex, optional): Index built over doc_result. When
+            None, the full document is used.
+        query (str): What the stage needs from the document
+        token_budget (int, optional): Maximum tokens of context
+
+    Returns:
+        str: The relevant part of the document, or all of it
+    """
+    if doc_index is None:
+        return doc_result
+    return doc_index.retrieve(query, token_budget or DEFAULT_CONTEXT_BUDGET)
+
+SHARED_CONTEXT_TEMPLATE = (
+    "LEARNING MATERIAL:\n{doc_result}\n\n"
+    "STUDENT'S RESPONSE/KNOWLEDGE (from transcript):\n{trans_result}\n\n"
+)
+
+# Providers whose stages share one evaluated prompt prefix (see select_llm.prefix_cache)
+PREFIX_REUSE_PROVIDERS = ("llama_cpp",)
+
+def shared_context(doc_result, trans_result, doc_index=None, token_budget=None, provider=None, query=None):
+    """
+    Render the learning material and transcript block that opens every stage's prompt.
+
+    For a local Llama-CPP model, every stage retrieves the document context
+    with the same query (the transcript), so the block is identical from gap
+    analysis to the revision tools and the model only has to evaluate it
+    once (see select_llm.prefix_cache). Other providers gain nothing from an
+    identical block, so each stage keeps retrieving with its own query.
+
+    Args:
+        doc_result (str): The full processed document
+        trans_result (str): Transcript of the student's explanation
+        doc_index (DocumentIndex, optional): Index built over doc_result
+        token_budget (int, optional): Maximum tokens of document context
+        provider (str, optional): Provider the prompt is sent to
+        query (str, optional): What this stage needs from the document.
+            Defaults to the transcript.
+
+    Returns:
+        str: The shared prompt prefix
+    """
+    if provider in PREFIX_REUSE_PROVIDERS or not query:
+        query = trans_result
+    doc_context = select_context(doc_result, doc_index, query, token_budget)
+    return SHARED_CONTEXT_TEMPLATE.format(doc_result=doc_context, trans_result=trans_result)
@@ -0,0 +1,124 @@
+import re
+import hashlib
+
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+\S")
+
+def split_by_headings(text):
+    """
+    Split markdown into blocks that each start at a heading
+
+    Args:
+        text (str): Markdown text
+
+    Returns:
+        list: Blocks of markdown, in document order. Text before the first
+        heading forms its own block.
+    """
+    blocks = []
+    current = []
+    in_code = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        if not in_code and HEADING_PATTERN.match(line) and current:
+            blocks.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current).strip())
+    return [block for block in blocks if block]
+
+def _split_oversized(block, count_tokens, max_tokens):
+    # Fall back from paragraphs to lines to fixed character windows so that
+    # no piece handed back exceeds the budget.
+    for separator in ("\n\n", "\n"):
+        parts = [part for part in block.split(separator) if part.strip()]
+        if len(parts) > 1:
+            return _pack(parts, count_tokens, max_tokens, separator)
+
+    pieces = []
+    step = max(1, len(block) * max_tokens // max(count_tokens(block), 1))
+    for start in range(0, len(block), step):
+        pieces.append(block[start:start + step])
+    return pieces
+
+def _pack(parts, count_tokens, max_tokens, separator, counts=None):
+    if counts is None:
+        counts = [count_tokens(part) for part in parts]
+    packed = []
+    current = []
+    current_tokens = 0
+    for part, part_tokens in zip(parts, counts):
+        if part_tokens > max_tokens:
+            if current:
+                packed.append(separator.join(current))
+                current, current_tokens = [], 0
+            packed.extend(_split_oversized(part, count_tokens, max_tokens))
+            continue
+        if current and current_tokens + part_tokens > max_tokens:
+            packed.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += part_tokens
+    if current:
+        packed.append(separator.join(current))
+    return packed
+
+def _ends_section(block, block_tokens, target_tokens):
+    # Decided by the block's own content, so editing one block cannot move
+    # the section boundaries elsewhere in the document. Larger blocks end a
+    # section more often, which keeps sections near target_tokens on average.
+    digest = hashlib.sha256(block.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32 < block_tokens / target_tokens
+
+def _pack_blocks(blocks, count_tokens, max_tokens, counts):
+    target_tokens = max(1, max_tokens // 2)
+    packed = []
+    current = []
+    current_tokens = 0
+    for block, block_tokens in zip(blocks, counts):
+        if block_tokens > max_tokens:
+            if current:
+                packed.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            packed.extend(_split_oversized(block, count_tokens, max_tokens))
+            continue
+        if current and current_tokens + block_tokens > max_tokens:
+            packed.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += block_tokens
+        if _ends_section(block, block_tokens, target_tokens):
+            packed.append("\n\n".join(current))
+            current, current_tokens = [], 0
+    if current:
+        packed.append("\n\n".join(current))
+    return packed
+
+def split_sections(text, count_tokens, max_tokens=1500, count_batch=None):
+    """
+    Split markdown along its heading structure into token-bounded sections.
+
+    Consecutive heading blocks are merged into sections, and blocks that are
+    larger than the budget are split on paragraph and then line boundaries.
+    Where a section ends is decided by the content of its last heading block
+    rather than by the running token count from the start of the document,
+    so an edit only changes the sections around the edited block and the
+    rest of a revised document splits into the same sections as before.
+
+    Args:
+        text (str): Markdown text
+        count_tokens (callable): Function returning the token count of a string
+        max_tokens (int): Maximum number of tokens per section
+        count_batch (callable, optional): Function returning the token counts of
+            a list of strings, used to count all heading blocks in one call
+
+    Returns:
+        list: Sections of markdown, in document order
+    """
+    blocks = split_by_headings(text)
+    if count_batch is not None:
+        counts = count_batch(blocks)
+    else:
+        counts = [count_tokens(block) for block in blocks]
+    return _pack_blocks(blocks, count_tokens, max_tokens, counts)
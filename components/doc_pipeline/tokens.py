@@ -0,0 +1,109 @@
+import threading
+
+DEFAULT_TOKENIZER = "Qwen/Qwen2.5-0.5B-Instruct"
+
+# Average characters per token for BPE tokenizers on English prose. Used by
+# estimate_tokens, which only needs to be good enough for threshold checks.
+CHARS_PER_TOKEN = 4
+
+_tokenizers = {}
+_lock = threading.Lock()
+
+def get_tokenizer(model_name=DEFAULT_TOKENIZER):
+    """
+    Return the shared tokenizer for a model, loading it on first use.
+
+    Tokenizers are loaded once per process and shared by every
+    DocumentProcessor, instead of once per upload.
+
+    Args:
+        model_name (str): Hugging Face model id of the tokenizer
+
+    Returns:
+        The loaded tokenizer
+    """
+    tokenizer = _tokenizers.get(model_name)
+    if tokenizer is None:
+        with _lock:
+            tokenizer = _tokenizers.get(model_name)
+            if tokenizer is None:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                _tokenizers[model_name] = tokenizer
+    return tokenizer
+
+def count_tokens(text, model_name=DEFAULT_TOKENIZER):
+    """
+    Count the tokens in a string without building tensors.
+
+    Fast tokenizers are called through their Rust backend directly. This
+    skips the Python-side padding/truncation setup, which is also what makes
+    concurrent calls from worker threads safe.
+
+    Args:
+        text (str): The text to count tokens for
+        model_name (str): Hugging Face model id of the tokenizer
+
+    Returns:
+        int: Number of tokens in the text
+    """
+    tokenizer = get_tokenizer(model_name)
+    if tokenizer.is_fast:
+        return len(tokenizer.backend_tokenizer.encode(text, add_special_tokens=False).ids)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+def count_tokens_batch(texts, model_name=DEFAULT_TOKENIZER):
+    """
+    Count the tokens of many strings in one call
+
+    Args:
+        texts (list): Strings to count tokens for
+        model_name (str): Hugging Face model id of the tokenizer
+
+    Returns:
+        list: Number of tokens in each string, in the same order
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    tokenizer = get_tokenizer(model_name)
+    if tokenizer.is_fast:
+        encodings = tokenizer.backend_tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [len(encoding.ids) for encoding in encodings]
+    return [len(tokenizer.encode(text, add_special_tokens=False)) for text in texts]
+
+def estimate_tokens(text):
+    """
+    Cheaply approximate the number of tokens in a string
+
+    Args:
+        text (str): The text to estimate
+
+    Returns:
+        int: Approximate number of tokens
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def exceeds(text, limit, model_name=DEFAULT_TOKENIZER, margin=0.25):
+    """
+    Check whether a string is longer than a token limit.
+
+    The estimate decides when it is clearly far from the limit; the exact
+    count is only computed when the estimate falls within the margin.
+
+    Args:
+        text (str): The text to check
+        limit (int): Token limit
+        model_name (str): Hugging Face model id of the tokenizer
+        margin (float): Relative distance from the limit within which the
+            exact count is used
+
+    Returns:
+        bool: True if the text has more than limit tokens
+    """
+    estimate = estimate_tokens(text)
+    if estimate < limit * (1 - margin):
+        return False
+    if estimate > limit * (1 + margin):
+        return True
+    return count_tokens(text, model_name) > limit
@@ -1,18 +1,14 @@
 from langchain_core.prompts import PromptTemplate
+from ..doc_pipeline.retrieval import shared_context
+from ..select_llm import client
 
-def learning_gap(llm,provider,doc_result, trans_result):
+def _learning_gap_request(doc_result, trans_result, doc_index=None, token_budget=None, provider=None):
     
     learning_gap_analysis_prompt = PromptTemplate.from_template(
-        """
+        """{shared_context}
         You are a Teaching Assistant responsible for providing detailed feedback on a student's understanding of course material. Your goal is to help the instructor identify knowledge gaps and provide constructive guidance to the student.
         
-        COURSE LEARNING MATERIAL:
-        {doc1}
-        
-        STUDENT'S RESPONSE/KNOWLEDGE (from transcript):
-        {doc2}
-        
-        As a TA, provide a comprehensive learning gap analysis that includes:
+        Using the LEARNING MATERIAL and the STUDENT'S RESPONSE/KNOWLEDGE above, as a TA, provide a comprehensive learning gap analysis that includes:
         
         1. DEMONSTRATED KNOWLEDGE: Identify specific concepts from the learning material that the student clearly understands, with direct examples from their response.
         
@@ -30,11 +26,17 @@ def learning_gap(llm,provider,doc_result, trans_result):
         """
     )
 
-    chain = learning_gap_analysis_prompt | llm 
-    analysis = chain.invoke({"doc1": doc_result, "doc2": trans_result})    
-    if provider == "google_genai":
-        return analysis.content
-    elif provider == "llama_cpp":
-        return analysis
-    elif provider == "ollama":
-        return analysis
\ No newline at end of file
+    # Only the sections related to what the student talked about, in the
+    # prefix shared by every stage
+    return learning_gap_analysis_prompt, {
+        "shared_context": shared_context(doc_result, trans_result, doc_index, token_budget, provider)
+    }
+
+def learning_gap(llm,provider,doc_result, trans_result, doc_index=None, token_budget=None):
+    prompt, inputs = _learning_gap_request(doc_result, trans_result, doc_index, token_budget, provider)
+    return client.invoke(llm, provider, prompt, inputs, task="learning_gap")
+
+def learning_gap_stream(llm, provider, doc_result, trans_result, doc_index=None, token_budget=None):
+    """Same as learning_gap, but yields the analysis text as it is generated."""
+    prompt, inputs = _learning_gap_request(doc_result, trans_result, doc_index, token_budget, provider)
+    return client.stream(llm, provider, prompt, inputs, task="learning_gap")
@@ -1,27 +1,14 @@
 from langchain.prompts import PromptTemplate
 from langchain_core.language_models.chat_models import BaseChatModel # Assuming you use a ChatModel
+from ..doc_pipeline.retrieval import shared_context
+from ..select_llm import client
 
-def qna_check_and_scoring(llm: BaseChatModel, provider, doc_result: str, trans_result: str, analysis: str, qna: str) -> str:
-    """
-    Generates an expert evaluation of student Q&A based on provided materials.
-
-    Args:
-        llm: The language model instance.
-        doc_result: The primary learning material content.
-        trans_result: The student's prior knowledge or transcript.
-        analysis: Previous gap analysis history.
-        qna: The specific question(s) and the student's answer(s).
-
-    Returns:
-        A string containing the structured evaluation report.
-    """
-    answer_checker_prompt = PromptTemplate.from_template(
-        """
+ANSWER_CHECKER_TEMPLATE = """{shared_context}
     **Role**: You are an Expert Assessment Assistant specializing in Historical Analysis. Your task is to provide a rigorous, multi-dimensional evaluation of a student's response based on the provided materials.
 
     **Input Documents**:
-    *   **LEARNING MATERIAL ({doc1_ref})**: {doc1}
-    *   **STUDENT'S PRIOR KNOWLEDGE ({doc2_ref})**: {doc2}
+    *   **LEARNING MATERIAL ({doc1_ref})**: the LEARNING MATERIAL above
+    *   **STUDENT'S PRIOR KNOWLEDGE ({doc2_ref})**: the STUDENT'S RESPONSE/KNOWLEDGE above
     *   **GAP ANALYSIS HISTORY ({doc3_ref})**: {doc3}
     *   **QUESTION & ANSWER ({qna_ref})**: {question_answers}
 
@@ -102,7 +89,9 @@ def qna_check_and_scoring(llm: BaseChatModel, provider, doc_result: str, trans_r
 
     **End of Evaluation**
     """
-    )
+
+def _judge_request(doc_result: str, trans_result: str, analysis: str, qna: str, doc_index=None, token_budget=None, provider=None):
+    answer_checker_prompt = PromptTemplate.from_template(ANSWER_CHECKER_TEMPLATE)
 
     # Add reference names for clarity in the prompt
     doc1_ref = "Learning Material"
@@ -110,23 +99,44 @@ def qna_check_and_scoring(llm: BaseChatModel, provider, doc_result: str, trans_r
     doc3_ref = "Gap Analysis"
     qna_ref = "Q&A"
 
-    chain = answer_checker_prompt | llm
-    judge = chain.invoke({
-        "doc1": doc_result,
+    return answer_checker_prompt, {
+        "shared_context": shared_context(doc_result, trans_result, doc_index, token_budget, provider, query=qna),
         "doc1_ref": doc1_ref,
-        "doc2": trans_result,
         "doc2_ref": doc2_ref,
         "doc3": analysis,
         "doc3_ref": doc3_ref,
         "question_answers": qna,
         "qna_ref": qna_ref
-    })
-
-    # Assuming the LLM response is in the .content attribute for models like Gemma
-    # Adjust this based on the specific Langchain LLM wrapper you use
-    if provider == "google_genai":
-        return judge.content
-    elif provider == "llama_cpp":
-        return judge
-    elif provider == "ollama":
-        return judge
\ No newline at end of file
+    }
+
+def qna_check_and_scoring(llm: BaseChatModel, provider, doc_result: str, trans_result: str, analysis: str, qna: str,
+                          doc_index=None, token_budget=None) -> str:
+    """
+    Generates an expert evaluation of student Q&A based on provided materials.
+
+    Args:
+        llm: The language model instance.
+        doc_result: The primary learning material content.
+        trans_result: The student's prior knowledge or transcript.
+        analysis: Previous gap analysis history.
+        qna: The specific question(s) and the student's answer(s).
+        doc_index: Optional DocumentIndex over doc_result. When given, only the
+            relevant sections are sent to the model: those matching the
+            transcript for llama_cpp (PREFIX_REUSE_PROVIDERS), so every stage
+            shares the same evaluated prefix, and those matching qna for
+            every other provider.
+        token_budget: Maximum tokens of learning material taken from doc_index.
+
+    Returns:
+        A string containing the structured evaluation report.
+    """
+    prompt, inputs = _judge_request(doc_result, trans_result, analysis, qna, doc_index, token_budget, provider)
+    return client.invoke(llm, provider, prompt, inputs, task="judge")
+
+def qna_check_and_scoring_stream(llm: BaseChatModel, provider, doc_result: str, trans_result: str, analysis: str,
+                                 qna: str, doc_index=None, token_budget=None):
+    """
+    Same as qna_check_and_scoring, but yields the evaluation report as it is generated.
+    """
+    prompt, inputs = _judge_request(doc_result, trans_result, analysis, qna, doc_index, token_budget, provider)
+    return client.stream(llm, provider, prompt, inputs, task="judge")
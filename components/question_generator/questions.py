@@ -1,35 +1,69 @@
 from langchain.prompts import PromptTemplate
+import json
 import re
+from ..doc_pipeline.retrieval import shared_context
+from ..select_llm import client
+
+def _unescape(item):
+    # Undo escapes such as \" inside a question
+    try:
+        return json.loads(f'"{item}"', strict=False)
+    except json.JSONDecodeError:
+        return item
 
 def extract_python_list(text):
     # Find content between square brackets
-    match = re.search(r'\[(.*?)\]', text, re.DOTALL)
+    match = re.search(r'\[(.*)\]', text, re.DOTALL)
     if not match:
         return None
     
     # Get the content and split by commas followed by newlines
     content = match.group(1).strip()
-    items = re.findall(r'"(.*?)"', content)
+    items = re.findall(r'"((?:[^"\\]|\\.)*)"', content)
     
-    return items
+    return [_unescape(item) for item in items]
+
+QUESTIONS_SCHEMA = {
+    "title": "questions",
+    "description": "Open-ended questions targeting the student's learning gaps",
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {"type": "string"},
+            "minItems": 7,
+            "maxItems": 8
+        }
+    },
+    "required": ["questions"]
+}
 
-def question_gen(llm, provider, doc_result, trans_result, analysis):
+def parse_questions(text):
+  """
+  Returns the questions from a QUESTIONS_SCHEMA JSON response (also inside a
+  ```json fence, or as a bare list), falling back to scraping a list out of
+  free-form text.
+  """
+  try:
+    data = client.parse_json(text)
+  except ValueError:
+    data = None
+  questions = data.get("questions") if isinstance(data, dict) else data
+  if isinstance(questions, list) and all(isinstance(question, str) for question in questions):
+    return questions
+  return extract_python_list(text)
+
+def _question_gen_request(doc_result, trans_result, analysis, doc_index=None, token_budget=None, provider=None):
   question_gen_prompt = PromptTemplate.from_template(
-      """
+      """{shared_context}
       You are a Teaching Assistant responsible for generating a set of descriptive, open-ended questions based on a student's response to course material. Your questions should assess understanding and encourage critical thinking.
 
       STEPS:
-      1. Carefully review the STUDENT'S RESPONSE/KNOWLEDGE (from transcript) and compare it against the LEARNING MATERIAL and the LEARNING GAP ANALYSIS.
+      1. Carefully review the STUDENT'S RESPONSE/KNOWLEDGE (from transcript) above and compare it against the LEARNING MATERIAL above and the LEARNING GAP ANALYSIS below.
       2. Identify any topics the student did not explain properly, any skipped concepts, or misunderstandings highlighted in the gap analysis.
       3. Formulate questions that directly target these missing explanations or omitted topics to probe deeper understanding.
       4. Also include questions that revisit core concepts from the material that were not fully addressed in the transcript.
 
-      LEARNING MATERIAL:
-      {doc1}
-
-      STUDENT'S RESPONSE/KNOWLEDGE (from transcript):
-      {doc2}
-
       LEARNING GAP ANALYSIS:
       {doc3}
 
@@ -37,25 +71,31 @@ def question_gen(llm, provider, doc_result, trans_result, analysis):
       - Generate between 7 to 8 descriptive, open-ended questions.
       - Each question must focus on an identified gap: missing explanations, skipped topics, or misunderstandings.
       - Ensure every question probes deeper into the student’s comprehension and addresses specific gaps found in the transcript.
-      - Present the questions as a Python list of strings, for example:
-        [
-            "Describe how...",
-            "Explain why...",
-            "What would happen if...",
-            "Compare...",
-            "Discuss the significance of...",
-            "How does... relate to...",
-            "In what ways..."
-        ]
+      - Present the questions as a JSON object with a "questions" list of strings, for example:
+        {{
+            "questions": [
+                "Describe how...",
+                "Explain why...",
+                "What would happen if...",
+                "Compare...",
+                "Discuss the significance of...",
+                "How does... relate to...",
+                "In what ways..."
+            ]
+        }}
       """
   )
 
-  chain = question_gen_prompt | llm
-  questions = chain.invoke({"doc1": doc_result, "doc2":trans_result, "doc3": analysis})
+  return question_gen_prompt, {
+      "shared_context": shared_context(doc_result, trans_result, doc_index, token_budget, provider, query=analysis),
+      "doc3": analysis
+  }
+
+def question_gen(llm, provider, doc_result, trans_result, analysis, doc_index=None, token_budget=None):
+  prompt, inputs = _question_gen_request(doc_result, trans_result, analysis, doc_index, token_budget, provider)
+  return client.invoke_structured(llm, provider, prompt, inputs, QUESTIONS_SCHEMA, task="question_gen")["questions"]
 
-  if provider == "google_genai":
-    return extract_python_list(questions.content)
-  elif provider == "llama_cpp":
-    return extract_python_list(questions)
-  elif provider == "ollama":
-    return extract_python_list(questions)
+def question_gen_stream(llm, provider, doc_result, trans_result, analysis, doc_index=None, token_budget=None):
+  """Yields the raw model output as it is generated; parse the joined text with parse_questions."""
+  prompt, inputs = _question_gen_request(doc_result, trans_result, analysis, doc_index, token_budget, provider)
+  return client.stream(llm, provider, prompt, inputs, schema=QUESTIONS_SCHEMA, task="question_gen")
@@ -1,6 +1,31 @@
 from langchain.prompts import PromptTemplate
+from ..doc_pipeline.retrieval import shared_context
+from ..select_llm import client
 import re
 import ast
+import json
+
+SUPPLEMENTARY_QA_SCHEMA = {
+    "title": "supplementary_questions",
+    "description": "Supplementary questions with their correct answers",
+    "type": "object",
+    "properties": {
+        "pairs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "answer": {"type": "string"}
+                },
+                "required": ["question", "answer"]
+            },
+            "minItems": 7,
+            "maxItems": 8
+        }
+    },
+    "required": ["pairs"]
+}
 
 def extract_qa_string_list(text):
     """
@@ -29,54 +54,101 @@ def parse_qa_string(qa_str):
         return {'question': q, 'answer': a}
     return None
 
-def supplementary_qa_gen(
-    llm,
-    provider,
+def _supplementary_qa_request(
     evaluation_report,
     qna,
     analysis,
     doc_result,
-    trans_result
+    trans_result,
+    doc_index=None,
+    token_budget=None,
+    provider=None
 ):
     prompt = PromptTemplate.from_template(
-        """
-        You are a Teaching Assistant. Your task is to generate a set of 7-8 open-ended, descriptive supplementary questions WITH their correct answers, based on the following materials:
+        """{shared_context}
+        You are a Teaching Assistant. Your task is to generate a set of 7-8 open-ended, descriptive supplementary questions WITH their correct answers, based on the learning material and the student's response above and the following materials:
 
         - Evaluation Report: {evaluation_report}
         - Student Q&A Attempts: {qna}
         - Knowledge Gap Analysis: {analysis}
-        - Reference Materials: {doc_result}
-        - Student's Own Explanation: {trans_result}
 
         Instructions:
         - Each question should address a specific gap, misconception, or missed topic from the student's work.
         - Each answer should be clear, concise, and factually correct, based on the provided materials.
-        - Output ONLY a Python list of strings, each formatted as "Q: <question> | A: <answer>".
+        - Output ONLY a JSON object with a "pairs" list, each item having a "question" and an "answer".
 
         Example:
-        [
-            "Q: What is the Napoleonic Code? | A: The Napoleonic Code was a legal code established by Napoleon that influenced many modern legal systems.",
-            "Q: Explain the significance of the Bastille. | A: The storming of the Bastille marked the beginning of the French Revolution and symbolized the end of absolute monarchy."
-        ]
+        {{
+            "pairs": [
+                {{"question": "What is the Napoleonic Code?", "answer": "The Napoleonic Code was a legal code established by Napoleon that influenced many modern legal systems."}},
+                {{"question": "Explain the significance of the Bastille.", "answer": "The storming of the Bastille marked the beginning of the French Revolution and symbolized the end of absolute monarchy."}}
+            ]
+        }}
 
         Do not include any other text, comments, or formatting.
         """
     )
 
-    chain = prompt | llm
-    result = chain.invoke({
+    return prompt, {
+        "shared_context": shared_context(doc_result, trans_result, doc_index, token_budget, provider, query=f"{analysis}\n{qna}"),
         "evaluation_report": evaluation_report,
         "qna": qna,
-        "analysis": analysis,
-        "doc_result": doc_result,
-        "trans_result": trans_result
-    })
+        "analysis": analysis
+    }
 
-    if provider == "google_genai":
-        output = result.content
-    else:
-        output = result
+def _valid_pairs(pairs):
+    return [
+        {'question': pair['question'].strip(), 'answer': pair['answer'].strip()}
+        for pair in pairs
+        if isinstance(pair, dict) and pair.get('question') and pair.get('answer')
+    ]
 
+def parse_supplementary_qa(output):
+    """
+    Turns the model output into a list of {'question', 'answer'} dicts.
+    Accepts SUPPLEMENTARY_QA_SCHEMA JSON (also inside a ```json fence, or as a
+    bare list of pairs) and the older "Q: ... | A: ..." list.
+    """
+    try:
+        data = client.parse_json(output)
+    except ValueError:
+        data = None
+    pairs = data.get('pairs') if isinstance(data, dict) else data
+    if isinstance(pairs, list):
+        qa_pairs = _valid_pairs(pairs)
+        qa_pairs += [parse_qa_string(pair) for pair in pairs if isinstance(pair, str) and parse_qa_string(pair)]
+        if qa_pairs:
+            return qa_pairs
     qa_string_list = extract_qa_string_list(output)
     qa_pairs = [parse_qa_string(qas) for qas in qa_string_list if parse_qa_string(qas) is not None]
     return qa_pairs
+
+def supplementary_qa_gen(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    prompt, inputs = _supplementary_qa_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    output = client.invoke_structured(llm, provider, prompt, inputs, SUPPLEMENTARY_QA_SCHEMA, task="supplementary_qa")
+    return _valid_pairs(output["pairs"])
+
+def supplementary_qa_gen_stream(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    """Yields the raw model output as it is generated; pass the joined text through parse_supplementary_qa."""
+    prompt, inputs = _supplementary_qa_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    return client.stream(llm, provider, prompt, inputs, schema=SUPPLEMENTARY_QA_SCHEMA, task="supplementary_qa")
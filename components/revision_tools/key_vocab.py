@@ -1,17 +1,20 @@
 import re
 from langchain.prompts import PromptTemplate
+from ..doc_pipeline.retrieval import shared_context
+from ..select_llm import client
 
-def get_key_vocab(
-    llm,
-    provider,
+def _key_vocab_request(
     evaluation_report,
     qna,
     analysis,
     doc_result,
-    trans_result
+    trans_result,
+    doc_index=None,
+    token_budget=None,
+    provider=None
 ):
     vocab_prompt = PromptTemplate.from_template(
-        """
+        """{shared_context}
         You are an educational content generator.
         Your task is to create a list of 10-15 key vocabulary terms essential for the student's understanding of the topic, focusing on:
         - Terms/concepts the student misunderstood or struggled with (from evaluation report, Q&A, gap analysis)
@@ -26,26 +29,21 @@ def get_key_vocab(
         Evaluation Report: {evaluation_report}
         Student Q&A Attempts: {qna}
         Knowledge Gap Analysis: {analysis}
-        Reference Materials: {doc_result}
-        Student's Own Explanation: {trans_result}
+        Reference Materials and Student's Own Explanation: given above
         Example output:
         - **Revolution**: A major change in how a country is governed, often involving violence or war.
         - **Bastille**: A prison in Paris that was attacked at the start of the French Revolution.
         - **Ancien Regime**: The old system of government in France before the Revolution.
         """
     )
-    chain = vocab_prompt | llm
-    key_terms = chain.invoke({
+    return vocab_prompt, {
+        "shared_context": shared_context(doc_result, trans_result, doc_index, token_budget, provider, query=f"{analysis}\n{qna}"),
         "evaluation_report": evaluation_report,
         "qna": qna,
-        "analysis": analysis,
-        "doc_result": doc_result,
-        "trans_result": trans_result
-    })
-    
-    if provider == "google_genai":
-        key_terms = key_terms.content
-    
+        "analysis": analysis
+    }
+
+def format_key_vocab(key_terms):
     # Additional formatting to ensure the output matches the desired format
     # This will make sure terms are in bold format with proper list structure
     formatted_terms = key_terms.strip()
@@ -66,4 +64,33 @@ def get_key_vocab(
                 formatted_lines.append(line)
         formatted_terms = '\n'.join(formatted_lines)
     
-    return formatted_terms
\ No newline at end of file
+    return formatted_terms
+
+def get_key_vocab(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    prompt, inputs = _key_vocab_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    return format_key_vocab(client.invoke(llm, provider, prompt, inputs, task="key_vocab"))
+
+def get_key_vocab_stream(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    """Yields the raw vocabulary list as it is generated; pass the joined text through format_key_vocab."""
+    prompt, inputs = _key_vocab_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    return client.stream(llm, provider, prompt, inputs, task="key_vocab")
@@ -0,0 +1,71 @@
+# Generates the four Learning Material artifacts (audio transcript, summary notes,
+# supplementary questions, key vocabulary) at once. They only depend on the
+# finished evaluation, so they are requested concurrently instead of one by one.
+from functools import partial
+
+from ..select_llm import client
+from ..transcript_gen import transcript
+from . import summary, key_vocab, ex_questions
+
+ARTIFACTS = ("learning_transcript", "summary_notes", "qs_pairs", "vocab")
+
+def format_qna_for_transcript(qa_pairs):
+    return "\n".join(
+        [f"Q{i+1}. {pair['question']}\nAns: {pair['answer']}\n"
+         for i, pair in enumerate(qa_pairs)]
+    )
+
+def generate_all(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None,
+    artifacts=ARTIFACTS
+):
+    """
+    Generate the Learning Material artifacts concurrently.
+
+    Calls go through a thread pool bounded by the provider's concurrency
+    limit (see client.PROVIDER_CONCURRENCY), so remote providers run all four
+    at once while llama_cpp still generates them one after another.
+
+    Args:
+        llm: LangChain LLM or chat model
+        provider (str): Provider name returned by set_llm
+        evaluation_report (str): Final evaluation report
+        qna (list): Question/answer pairs of the session
+        analysis (str): GAP analysis
+        doc_result (str): Processed document
+        trans_result (str): Study session transcript
+        doc_index (DocumentIndex, optional): Retrieval index over doc_result
+        token_budget (int, optional): Token budget for the document context
+        artifacts (tuple): Subset of ARTIFACTS to generate
+
+    Yields:
+        tuple: (artifact name, result, error) as each artifact finishes
+    """
+    common = dict(
+        llm=llm,
+        provider=provider,
+        evaluation_report=evaluation_report,
+        analysis=analysis,
+        doc_result=doc_result,
+        trans_result=trans_result,
+        doc_index=doc_index,
+        token_budget=token_budget,
+    )
+    calls = {
+        "learning_transcript": partial(transcript.get_transcript, qna=format_qna_for_transcript(qna), **common),
+        "summary_notes": partial(summary.get_summary_notes, qna=qna, **common),
+        "qs_pairs": partial(ex_questions.supplementary_qa_gen, qna=qna, **common),
+        "vocab": partial(key_vocab.get_key_vocab, qna=qna, **common),
+    }
+    yield from client.run_concurrently(
+        {name: call for name, call in calls.items() if name in artifacts},
+        provider
+    )
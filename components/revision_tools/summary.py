@@ -1,18 +1,21 @@
 import re
 from langchain.prompts import PromptTemplate
+from ..doc_pipeline.retrieval import shared_context
+from ..select_llm import client
 
-def get_summary_notes(
-    llm,
-    provider,
+def _summary_notes_request(
     evaluation_report,
     qna,
     analysis,
     doc_result,
-    trans_result
+    trans_result,
+    doc_index=None,
+    token_budget=None,
+    provider=None
 ):
 
     summary_prompt = PromptTemplate.from_template(
-        """
+        """{shared_context}
         You are an expert educational content creator specializing in creating concise, targeted study notes.
         
         Create comprehensive summary notes for the student based on their learning assessment. These notes should:
@@ -37,30 +40,49 @@ def get_summary_notes(
         Evaluation Report: {evaluation_report}
         Student Q&A Attempts: {qna}
         Knowledge Gap Analysis: {analysis}
-        Reference Materials: {doc_result}
-        Student's Original Explanation: {trans_result}
+        Reference Materials and Student's Original Explanation: given above
         
         Create targeted study notes that will help this student master the concepts they're struggling with while reinforcing their existing knowledge.
         """
     )
 
-    chain = summary_prompt | llm
-    summary_note = chain.invoke({
+    return summary_prompt, {
+        "shared_context": shared_context(doc_result, trans_result, doc_index, token_budget, provider, query=f"{analysis}\n{qna}"),
         "evaluation_report": evaluation_report,
         "qna": qna,
-        "analysis": analysis,
-        "doc_result": doc_result,
-        "trans_result": trans_result
+        "analysis": analysis
         }
-    )
-
-    if provider == "google_genai":
-        summary_note = summary_note.content    
-    elif provider == "llama_cpp":
-        summary_note = summary_note
-    elif provider == "ollama":
-        summary_note = summary_note
 
+def clean_summary_notes(summary_note):
     summary_note = re.sub(r'[^a-zA-Z0-9\s()+-,.?!$%&\'"]', '', summary_note)    
     
-    return summary_note
\ No newline at end of file
+    return summary_note
+
+def get_summary_notes(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    prompt, inputs = _summary_notes_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    return clean_summary_notes(client.invoke(llm, provider, prompt, inputs, task="summary_notes"))
+
+def get_summary_notes_stream(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    """Yields the raw notes as they are generated; pass the joined text through clean_summary_notes."""
+    prompt, inputs = _summary_notes_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    return client.stream(llm, provider, prompt, inputs, task="summary_notes")
@@ -0,0 +1,114 @@
+"""
+Benchmark the Whisper backends (FP32 torch, INT8 dynamic quantization, ONNX Runtime).
+
+Each backend transcribes the same recording. The report gives the real-time
+factor (processing seconds per second of audio, lower is faster) and the
+word error rate against the FP32 torch transcript. A backend whose WER
+exceeds the tolerance is flagged and should not be selected.
+
+Usage:
+    python -m components.sTT_model.benchmark
+    python -m components.sTT_model.benchmark --audio lecture.mp3 --backends torch onnx
+"""
+import argparse
+import gc
+import os
+import re
+import time
+
+from .whisper_tiny import AudioTranscriptor, BACKENDS
+
+DEFAULT_AUDIO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "transcripter_api", "recording.mp3"
+)
+WER_TOLERANCE = 0.05
+
+def _words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word-level edit distance over the reference length (case and punctuation ignored)
+
+    Args:
+        reference (str): Reference transcript
+        hypothesis (str): Transcript to score
+
+    Returns:
+        float: Substitutions + insertions + deletions per reference word
+    """
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+def run_backend(backend, audio, model_name="openai/whisper-tiny", repeats=2):
+    """
+    Time one backend on a recording
+
+    Args:
+        backend (str): One of BACKENDS
+        audio (np.ndarray): 16 kHz mono samples
+        model_name (str): Whisper checkpoint
+        repeats (int): Timed runs after a warm-up; the best one is reported
+
+    Returns:
+        dict: backend, load seconds, best seconds, real-time factor and the transcript
+    """
+    start = time.perf_counter()
+    transcriptor = AudioTranscriptor(model_name=model_name, device="cpu", backend=backend)
+    load_seconds = time.perf_counter() - start
+
+    text = transcriptor.transcribe_array(audio)  # warm-up
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        text = transcriptor.transcribe_array(audio)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    del transcriptor
+    gc.collect()
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "seconds": round(best, 3),
+        "rtf": best / (len(audio) / 16000),
+        "text": text,
+    }
+
+def main(argv=None):
+    import librosa
+
+    parser = argparse.ArgumentParser(description="Benchmark Whisper backends on CPU")
+    parser.add_argument("--audio", default=DEFAULT_AUDIO, help="Recording to transcribe")
+    parser.add_argument("--model", default="openai/whisper-tiny")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--wer-tolerance", type=float, default=WER_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    audio, _ = librosa.load(args.audio, sr=16000)
+    print(f"{args.audio}: {len(audio) / 16000:.1f}s of audio")
+
+    # The FP32 torch transcript is the reference
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+    results = [run_backend(backend, audio, args.model, args.repeats) for backend in backends]
+
+    reference = results[0]
+    print(f"{'backend':<10}{'load s':>8}{'seconds':>10}{'RTF':>8}{'speedup':>9}{'WER':>8}  within tolerance")
+    for result in results:
+        wer = word_error_rate(reference["text"], result["text"])
+        speedup = reference["seconds"] / result["seconds"] if result["seconds"] else float("nan")
+        print(f"{result['backend']:<10}{result['load_seconds']:>8}{result['seconds']:>10}"
+              f"{result['rtf']:>8.3f}{speedup:>8.2f}x{wer:>8.3f}  {wer <= args.wer_tolerance}")
+
+if __name__ == "__main__":
+    main()
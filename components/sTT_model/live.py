@@ -0,0 +1,197 @@
+"""
+Incremental transcription of a recording that is still in progress.
+
+Audio is fed in as it arrives (the AudioRecorder queue, or any stream of
+sample blocks). Every step_s of new audio, everything up to the last pause
+is transcribed once and committed; the speech after it is re-transcribed as
+a tentative tail that is replaced on the next step. When recording stops
+only the final tail is left to decode, so the transcript is ready seconds
+later instead of after a full pass over the file.
+"""
+import queue
+import threading
+
+import numpy as np
+
+from .shared import get_transcriber
+from .vad import frame_energy_db, speech_segments, speech_windows
+
+SAMPLING_RATE = 16000  # Whisper's input rate
+
+def _to_mono(samples):
+    samples = np.asarray(samples, dtype=np.float32)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return samples
+
+def _resample(samples, orig_sr, target_sr=SAMPLING_RATE):
+    if orig_sr == target_sr or len(samples) == 0:
+        return samples
+    import librosa
+    return librosa.resample(samples, orig_sr=orig_sr, target_sr=target_sr)
+
+class LiveTranscriber:
+    """
+    Rolling-window transcription of audio fed while it is being recorded.
+    """
+
+    def __init__(self, transcriber=None, step_s=3.0, max_window_s=30, min_pause_s=0.5,
+                 tentative=True, on_update=None):
+        """
+        Args:
+            transcriber (SharedTranscriber, optional): Defaults to the shared whisper-tiny
+            step_s (float): New audio between two transcription steps
+            max_window_s (float): Uncommitted audio is cut at its quietest point past this length
+            min_pause_s (float): Silence after a speech segment that lets it be committed
+            tentative (bool): Also decode the uncommitted tail on every step
+            on_update (callable, optional): Called with (committed_text, tentative_text)
+                after every step
+        """
+        self.transcriber = transcriber or get_transcriber()
+        self.step_s = step_s
+        self.max_window_s = max_window_s
+        self.min_pause_s = min_pause_s
+        self.show_tentative = tentative
+        self.on_update = on_update
+
+        self.committed = []
+        self.tentative = ""
+        self._raw = []
+        self._raw_rate = SAMPLING_RATE
+        self._raw_seconds = 0.0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        """Committed transcript so far"""
+        return " ".join(part for part in self.committed if part)
+
+    def feed(self, samples, sampling_rate=SAMPLING_RATE):
+        """
+        Add a block of recorded audio; transcribes once step_s has accumulated
+
+        Args:
+            samples (np.ndarray): Samples, mono or (frames, channels)
+            sampling_rate (int): Rate of the block
+        """
+        with self._lock:
+            if self._raw and sampling_rate != self._raw_rate:
+                self._flush_raw()
+            self._raw_rate = sampling_rate
+            block = _to_mono(samples)
+            self._raw.append(block)
+            self._raw_seconds += len(block) / sampling_rate
+            if self._raw_seconds >= self.step_s:
+                self._step(final=False)
+
+    def finish(self):
+        """
+        Transcribe whatever is left after recording stopped
+
+        Returns:
+            str: The full transcript
+        """
+        with self._lock:
+            self._step(final=True)
+            return self.text
+
+    def follow(self, recorder, poll_s=0.1):
+        """
+        Consume an AudioRecorder's queue on a background thread until it stops
+
+        Args:
+            recorder (AudioRecorder): A recorder that has been started
+            poll_s (float): Queue wait between checks of recorder.recording
+
+        Returns:
+            threading.Thread: Joins once the transcript is final (see finish)
+        """
+        def run():
+            while recorder.recording:
+                try:
+                    self.feed(recorder.q.get(timeout=poll_s), recorder.samplerate)
+                except queue.Empty:
+                    continue
+            # Blocks the recorder put before it stopped
+            while True:
+                try:
+                    self.feed(recorder.q.get_nowait(), recorder.samplerate)
+                except queue.Empty:
+                    break
+            self.finish()
+
+        thread = threading.Thread(target=run, name="live-transcription", daemon=True)
+        thread.start()
+        return thread
+
+    def _flush_raw(self):
+        if self._raw:
+            audio = _resample(np.concatenate(self._raw), self._raw_rate)
+            self._pending = np.concatenate([self._pending, audio.astype(np.float32)])
+        self._raw, self._raw_seconds = [], 0.0
+
+    def _commit_point(self):
+        # End of the last speech segment followed by at least min_pause_s of silence
+        pending = self._pending
+        min_pause = int(self.min_pause_s * SAMPLING_RATE)
+        cut = 0
+        for _, end in speech_segments(pending, SAMPLING_RATE):
+            if end + min_pause <= len(pending):
+                cut = end
+        max_samples = int(self.max_window_s * SAMPLING_RATE)
+        if cut == 0 and len(pending) > max_samples:
+            # No pause in a whole window: cut at its quietest frame in the last 10 s
+            search_start = max(0, max_samples - 10 * SAMPLING_RATE)
+            energy, frame = frame_energy_db(pending[search_start:max_samples], SAMPLING_RATE)
+            cut = search_start + int(np.argmin(energy)) * frame + frame // 2 if len(energy) else max_samples
+        return cut
+
+    def _step(self, final):
+        self._flush_raw()
+        cut = len(self._pending) if final else self._commit_point()
+
+        if cut:
+            text = self.transcriber.transcribe_array(self._pending[:cut])
+            if text:
+                self.committed.append(text)
+            self._pending = self._pending[cut:]
+
+        if final or not self.show_tentative or not len(self._pending):
+            self.tentative = ""
+        else:
+            # Re-decoded every step: the tail is at most one window and still changing
+            self.tentative = self.transcriber.transcribe_array(self._pending)
+
+        if self.on_update:
+            self.on_update(self.text, self.tentative)
+
+def transcribe_progressively(audio, sampling_rate=SAMPLING_RATE, transcriber=None, max_window_s=30,
+                             windows_per_update=1):
+    """
+    Transcribe a complete recording window by window, yielding as it goes.
+
+    For audio that arrives in one piece (uploads, the browser recorder), so
+    the first sentences show while the rest is decoded. A recording of a
+    minute or two only spans a few windows, so the default updates after
+    every window instead of after a full batch of the hardware profile.
+
+    Args:
+        audio (np.ndarray): Mono samples
+        sampling_rate (int): Rate of the samples
+        transcriber (SharedTranscriber, optional): Defaults to the shared whisper-tiny
+        max_window_s (float): Window length
+        windows_per_update (int): Windows decoded together between two yields
+
+    Yields:
+        str: The transcript so far, after each batch of windows
+    """
+    transcriber = transcriber or get_transcriber()
+    audio = _resample(_to_mono(audio), sampling_rate)
+    windows = [window["audio"] for window in speech_windows(audio, SAMPLING_RATE, max_window_s)]
+
+    texts = []
+    for start in range(0, len(windows), windows_per_update):
+        texts.extend(transcriber.decode_windows(windows[start:start + windows_per_update],
+                                                batch_size=windows_per_update))
+        yield " ".join(text for text in texts if text)
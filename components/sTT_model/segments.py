@@ -0,0 +1,88 @@
+"""
+Stitching of timestamped segments decoded from overlapping Whisper windows.
+"""
+import re
+
+def _words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def _strip_repeated_words(previous, text, min_words=1):
+    # Drop the longest start of text that repeats the end of previous
+    previous_words, words = _words(previous), text.split()
+    for size in range(min(len(previous_words), len(words)), min_words - 1, -1):
+        if previous_words[-size:] == _words(" ".join(words[:size])):
+            return " ".join(words[size:])
+    return text
+
+def stitch_segments(windows, duration, edge_s=0.1):
+    """
+    Merge the segments of overlapping windows into one timeline.
+
+    Each overlap is split at its middle: a segment is kept from the window
+    whose half of the overlap holds the segment's midpoint. A window's last
+    segment may be cut by the window edge (no end timestamp, or ending at
+    the edge); when another window follows, such a segment is dropped if it
+    starts inside the next window, which decodes it whole and keeps
+    everything from its start on. If it started earlier it is kept up to the
+    edge, the next window's segments inside it are dropped and the words it
+    repeats at the start of the next one are removed.
+
+    Args:
+        windows (list): Decoded windows in order, each a dict with "start_s"
+            and "length_s" (position in the recording), "keep_from" and
+            "keep_to" (its half-overlap bounds), "next_start_s" (start of the
+            next decoded window, None for the last) and "segments" (Whisper
+            offsets: {"text", "timestamp": (start, end or None)} relative to
+            the window)
+        duration (float): Length of the recording in seconds
+        edge_s (float): A segment ending this close to the window edge counts as cut
+
+    Returns:
+        list: {"start", "end", "text"} per segment, times in seconds from
+            the start of the recording
+    """
+    segments = []
+    carry = None  # Cut segment kept from the previous window
+    resume_s = None  # Start of a cut segment the previous window dropped
+    for window in windows:
+        window_end = window["start_s"] + window["length_s"]
+        next_start = window["next_start_s"]
+        keep_from = window["keep_from"] if resume_s is None else min(window["keep_from"], resume_s)
+        resume_s = None
+        for segment in window["segments"]:
+            text = segment["text"].strip()
+            start, end = segment["timestamp"]
+            cut = end is None or end >= window["length_s"] - edge_s
+            start = window["start_s"] + start
+            end = window_end if end is None else window["start_s"] + end
+            end = min(end, duration)
+            if not text:
+                continue
+
+            if carry is not None:
+                # Words already kept from the cut segment of the previous window
+                if end <= carry["end"]:
+                    continue
+                if start < carry["end"]:
+                    text = _strip_repeated_words(carry["text"], text)
+                    if not text:
+                        continue
+            elif not keep_from <= (start + end) / 2:
+                continue
+
+            if cut and next_start is not None:
+                if start >= next_start:
+                    resume_s = start if resume_s is None else resume_s
+                    continue
+            elif (start + end) / 2 >= window["keep_to"]:
+                continue
+
+            if segments and start < segments[-1]["end"]:
+                if _words(text) == _words(segments[-1]["text"]):
+                    continue
+                start = segments[-1]["end"]
+            segments.append({"start": round(start, 2), "end": round(max(start, end), 2), "text": text})
+
+        last = segments[-1] if segments else None
+        carry = last if last is not None and next_start is not None and last["end"] >= window_end - edge_s else None
+    return segments
@@ -0,0 +1,201 @@
+import gc
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_IDLE_TIMEOUT_S = 600
+
+class SharedTranscriber:
+    """
+    A lazily loaded AudioTranscriptor shared by every session of the process.
+
+    The Whisper processor and model are loaded on first use and kept warm
+    between transcriptions, then released after idle_timeout_s without use.
+    Transcriptions run one at a time: torch already spreads a single
+    transcription over the tuned number of threads, and concurrent runs
+    would only compete for the same cores.
+    """
+
+    def __init__(self, model_name="openai/whisper-tiny", idle_timeout_s=DEFAULT_IDLE_TIMEOUT_S, **options):
+        """
+        Initialize the shared transcriber (the model is not loaded yet)
+
+        Args:
+            model_name (str): Whisper checkpoint
+            idle_timeout_s (float): Seconds without use before the model is unloaded.
+                None keeps it loaded.
+            **options: Other AudioTranscriptor arguments
+        """
+        self.model_name = model_name
+        self.idle_timeout_s = idle_timeout_s
+        self.options = options
+
+        self._transcriptor = None
+        self._active = 0
+        self._last_used = time.monotonic()
+        self._lock = threading.Lock()       # guards the fields above
+        self._load_lock = threading.Lock()  # one load at a time
+        self._run_lock = threading.Lock()   # one transcription at a time
+        self._watcher = None
+
+    @property
+    def is_loaded(self):
+        return self._transcriptor is not None
+
+    def _load(self):
+        from .whisper_tiny import AudioTranscriptor
+
+        with self._load_lock:
+            if self._transcriptor is None:
+                start = time.perf_counter()
+                transcriptor = AudioTranscriptor(model_name=self.model_name, **self.options)
+                print(f"Loaded {self.model_name} in {time.perf_counter() - start:.1f}s")
+                with self._lock:
+                    self._transcriptor = transcriptor
+            self._start_watcher()
+            return self._transcriptor
+
+    def _start_watcher(self):
+        if self.idle_timeout_s is None:
+            return
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._watcher = threading.Thread(target=self._watch, name="whisper-idle-unload", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        interval = max(1.0, min(self.idle_timeout_s / 4, 30.0))
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                if self._transcriptor is None:
+                    return
+                idle = self._active == 0 and time.monotonic() - self._last_used >= self.idle_timeout_s
+            if idle and self.unload(only_if_idle=True):
+                print(f"Unloaded {self.model_name} after {self.idle_timeout_s}s idle")
+                return
+
+    @contextmanager
+    def use(self):
+        """
+        Borrow the loaded AudioTranscriptor for one transcription.
+
+        Yields:
+            AudioTranscriptor: The shared transcriber, loaded if needed
+        """
+        with self._lock:
+            self._active += 1
+        try:
+            transcriptor = self._transcriptor or self._load()
+            with self._run_lock:
+                yield transcriptor
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_used = time.monotonic()
+
+    def transcribe(self, audio_path, **kwargs):
+        """
+        Transcribe an audio file with the shared model
+
+        Args:
+            audio_path (str): Path to the audio file
+            **kwargs: Arguments for AudioTranscriptor.whisper_transcribe
+
+        Returns:
+            str: The transcript, or None on error
+        """
+        with self.use() as transcriptor:
+            return transcriptor.whisper_transcribe(audio_path, **kwargs)
+
+    def transcribe_array(self, audio_array, **kwargs):
+        """
+        Transcribe 16 kHz mono samples with the shared model
+
+        Args:
+            audio_array (np.ndarray): Samples
+            **kwargs: Arguments for AudioTranscriptor.transcribe_array
+
+        Returns:
+            str: The transcript
+        """
+        with self.use() as transcriptor:
+            return transcriptor.transcribe_array(audio_array, **kwargs)
+
+    def transcribe_segments(self, audio_array, **kwargs):
+        """
+        Timestamped transcription of 16 kHz mono samples with the shared model
+
+        Args:
+            audio_array (np.ndarray): Samples
+            **kwargs: Arguments for AudioTranscriptor.transcribe_segments
+
+        Returns:
+            list: {"start", "end", "text"} per segment
+        """
+        with self.use() as transcriptor:
+            return transcriptor.transcribe_segments(audio_array, **kwargs)
+
+    def decode_windows(self, chunks, **kwargs):
+        """
+        Decode prepared windows of at most 30 s with the shared model
+
+        Args:
+            chunks (list): 16 kHz mono windows
+            **kwargs: Arguments for AudioTranscriptor.decode_windows
+
+        Returns:
+            list: One text per window
+        """
+        with self.use() as transcriptor:
+            return transcriptor.decode_windows(chunks, **kwargs)
+
+    def unload(self, only_if_idle=False):
+        """
+        Release the model
+
+        Args:
+            only_if_idle (bool): Keep it if a transcription is running or the
+                model was used within idle_timeout_s
+
+        Returns:
+            bool: Whether a model was released
+        """
+        with self._lock:
+            if self._transcriptor is None:
+                return False
+            if only_if_idle and (self._active or time.monotonic() - self._last_used < self.idle_timeout_s):
+                return False
+            self._transcriptor = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        return True
+
+_transcribers = {}
+_lock = threading.Lock()
+
+def get_transcriber(model_name="openai/whisper-tiny", idle_timeout_s=DEFAULT_IDLE_TIMEOUT_S, **options):
+    """
+    Return the process-wide SharedTranscriber for a model and options.
+
+    Args:
+        model_name (str): Whisper checkpoint
+        idle_timeout_s (float): Seconds without use before the model is unloaded
+        **options: Other AudioTranscriptor arguments
+
+    Returns:
+        SharedTranscriber: The shared transcriber (loaded on first use)
+    """
+    key = (model_name, tuple(sorted(options.items())))
+    with _lock:
+        if key not in _transcribers:
+            _transcribers[key] = SharedTranscriber(model_name, idle_timeout_s, **options)
+        transcriber = _transcribers[key]
+        transcriber.idle_timeout_s = idle_timeout_s
+        return transcriber
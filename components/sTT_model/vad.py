@@ -0,0 +1,156 @@
+"""
+Energy-based voice activity detection for Whisper.
+
+Speech is located from short-frame energy, silence is dropped, and the
+speech segments are packed into windows of at most 30 s (Whisper's input
+length) that are cut at pauses instead of at fixed offsets.
+"""
+import numpy as np
+
+def frame_energy_db(audio, sampling_rate=16000, frame_ms=30):
+    """
+    Args:
+        audio (np.ndarray): Mono samples in [-1, 1]
+        sampling_rate (int): Samples per second
+        frame_ms (int): Frame length
+
+    Returns:
+        tuple: (energy in dBFS per frame, frame length in samples)
+    """
+    frame = max(1, int(sampling_rate * frame_ms / 1000))
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.zeros(0), frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame).astype(np.float64)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10)), frame
+
+def speech_segments(audio, sampling_rate=16000, frame_ms=30, margin_db=10.0, dynamic_range_db=45.0,
+                    min_speech_ms=250, min_silence_ms=300, pad_ms=150):
+    """
+    Find the speech segments of a recording.
+
+    A frame is speech when its energy is margin_db above the noise floor
+    (10th percentile of frame energy), and never more than dynamic_range_db
+    below the loudest frame. Pauses shorter than min_silence_ms are bridged
+    and each segment is padded so word onsets and endings are kept.
+
+    Args:
+        audio (np.ndarray): Mono samples in [-1, 1]
+        sampling_rate (int): Samples per second
+        frame_ms (int): Analysis frame length
+        margin_db (float): Threshold above the noise floor
+        dynamic_range_db (float): Threshold floor relative to the loudest frame
+        min_speech_ms (int): Shorter bursts (clicks, breaths) are dropped
+        min_silence_ms (int): Shorter pauses do not split a segment
+        pad_ms (int): Audio kept on each side of a segment
+
+    Returns:
+        list: (start, end) sample offsets of each speech segment
+    """
+    energy, frame = frame_energy_db(audio, sampling_rate, frame_ms)
+    if len(energy) == 0:
+        return []
+    threshold = max(np.percentile(energy, 10) + margin_db, energy.max() - dynamic_range_db)
+    voiced = energy > threshold
+
+    segments = []
+    start = None
+    for index, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = index
+        elif not is_voiced and start is not None:
+            segments.append([start, index])
+            start = None
+    if start is not None:
+        segments.append([start, len(voiced)])
+
+    # Bridge short pauses, then drop short bursts
+    min_silence = max(1, min_silence_ms // frame_ms)
+    merged = []
+    for segment in segments:
+        if merged and segment[0] - merged[-1][1] < min_silence:
+            merged[-1][1] = segment[1]
+        else:
+            merged.append(segment)
+    min_speech = max(1, min_speech_ms // frame_ms)
+    pad = int(sampling_rate * pad_ms / 1000)
+    padded = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start, end = max(0, start * frame - pad), min(len(audio), end * frame + pad)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+def _split_long(audio, start, end, max_samples, sampling_rate, frame_ms=30, search_s=10):
+    # Cut a segment longer than a window at its quietest frame near the limit
+    pieces = []
+    while end - start > max_samples:
+        search_start = start + max(0, max_samples - search_s * sampling_rate)
+        region = audio[search_start:start + max_samples]
+        energy, frame = frame_energy_db(region, sampling_rate, frame_ms)
+        cut = search_start + (int(np.argmin(energy)) * frame + frame // 2 if len(energy) else len(region))
+        if cut <= start:
+            cut = start + max_samples
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+def speech_windows(audio, sampling_rate=16000, max_window_s=30, gap_s=0.2, **vad_options):
+    """
+    Pack the speech of a recording into Whisper windows.
+
+    Consecutive speech segments are concatenated, separated by gap_s of
+    silence, until the next one would exceed max_window_s. Segments longer
+    than a window are cut at their quietest point.
+
+    Args:
+        audio (np.ndarray): Mono samples in [-1, 1]
+        sampling_rate (int): Samples per second
+        max_window_s (float): Window length (Whisper takes 30 s)
+        gap_s (float): Silence inserted between packed segments
+        **vad_options: Options for speech_segments
+
+    Returns:
+        list: One dict per window with "audio" (np.ndarray) and "spans", a
+            list of (start_s in the recording, end_s in the recording,
+            offset_s in the window) for each packed segment
+    """
+    max_samples = int(max_window_s * sampling_rate)
+    gap = np.zeros(int(gap_s * sampling_rate), dtype=audio.dtype)
+
+    pieces = []
+    for start, end in speech_segments(audio, sampling_rate, **vad_options):
+        pieces.extend(_split_long(audio, start, end, max_samples, sampling_rate))
+
+    windows = []
+    parts, spans, length = [], [], 0
+    for start, end in pieces:
+        size = end - start
+        if parts and length + len(gap) + size > max_samples:
+            windows.append({"audio": np.concatenate(parts), "spans": spans})
+            parts, spans, length = [], [], 0
+        if parts:
+            parts.append(gap)
+            length += len(gap)
+        spans.append((start / sampling_rate, end / sampling_rate, length / sampling_rate))
+        parts.append(audio[start:end])
+        length += size
+    if parts:
+        windows.append({"audio": np.concatenate(parts), "spans": spans})
+    return windows
+
+def speech_ratio(audio, sampling_rate=16000, **vad_options):
+    """
+    Returns:
+        float: Fraction of the recording detected as speech
+    """
+    if len(audio) == 0:
+        return 0.0
+    speech = sum(end - start for start, end in speech_segments(audio, sampling_rate, **vad_options))
+    return speech / len(audio)
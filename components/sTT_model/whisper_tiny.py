@@ -1,36 +1,98 @@
-from transformers import WhisperProcessor, WhisperForConditionalGeneration, pipeline
+from transformers import WhisperProcessor, WhisperForConditionalGeneration
 import librosa
+import os
 import torch
 from typing import Optional, List, Dict
 
+from ..doc_pipeline.cache import DEFAULT_CACHE_DIR
+from ..tuning.profile import load_profile, apply_torch_threads, WHISPER_BACKENDS as BACKENDS
+from .segments import stitch_segments
+from .vad import speech_segments, speech_windows
+
+ONNX_EXPORT_DIR = os.path.join(DEFAULT_CACHE_DIR, "onnx")
+
+def _load_int8(model_name):
+    model = WhisperForConditionalGeneration.from_pretrained(model_name)
+    # Weights are quantized ahead of time, activations per batch at run time
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_onnx(model_name, export_dir=ONNX_EXPORT_DIR):
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+
+    session_options = onnxruntime.SessionOptions()
+    session_options.intra_op_num_threads = load_profile()["whisper"]["torch_threads"]
+
+    # The export takes a while, so it is done once per checkpoint and reused
+    path = os.path.join(export_dir, model_name.replace("/", "--"))
+    if not os.path.isdir(path):
+        model = ORTModelForSpeechSeq2Seq.from_pretrained(model_name, export=True)
+        model.save_pretrained(path)
+    return ORTModelForSpeechSeq2Seq.from_pretrained(
+        path, provider="CPUExecutionProvider", session_options=session_options
+    )
+
 class AudioTranscriptor:
     def __init__(self, model_name: str = "openai/whisper-tiny", 
                  device: Optional[str] = None, 
-                 chunk_length_s: int = 30):
+                 chunk_length_s: int = 30,
+                 backend: Optional[str] = None):
         # Device configuration
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        apply_torch_threads("whisper")
+
+        # INT8 and ONNX Runtime are CPU backends
+        backend = backend or load_profile()["whisper"]["backend"]
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown Whisper backend {backend!r}, expected one of {BACKENDS}")
+        if backend != "torch" and self.device != "cpu":
+            print(f"Whisper backend {backend} runs on CPU only, using torch on {self.device}")
+            backend = "torch"
+        self.backend = backend
         
         # Initialize processor and model
         self.processor = WhisperProcessor.from_pretrained(model_name)
-        self.model = WhisperForConditionalGeneration.from_pretrained(model_name)
+        if backend == "int8":
+            self.model = _load_int8(model_name)
+        elif backend == "onnx":
+            self.model = _load_onnx(model_name)
+        else:
+            self.model = WhisperForConditionalGeneration.from_pretrained(model_name)
         self.model.config.forced_decoder_ids = None
         
         # Optimization configurations
-        self.model = self.model.to(self.device)
-        if torch.__version__ >= "2.0" and self.device == "cuda":
-            self.model = torch.compile(self.model)
+        if backend == "torch":
+            self.model = self.model.to(self.device)
+            if torch.__version__ >= "2.0" and self.device == "cuda":
+                self.model = torch.compile(self.model)
         
         # Chunk processing parameters
         self.chunk_length_s = chunk_length_s
         self.sampling_rate = 16000  # Whisper's required sampling rate
 
-    def whisper_transcribe(self, audio_path: str, 
-                  batch_size: int = 8, 
-                  return_timestamps: bool = False) -> str:
-        try:
-            # Load and resample audio
-            audio_array, _ = librosa.load(audio_path, sr=self.sampling_rate)
-            
+    def transcribe_array(self, audio_array, 
+                  batch_size: Optional[int] = None, 
+                  use_vad: bool = True) -> str:
+        """
+        Transcribe 16 kHz mono samples (already loaded or streamed)
+
+        Args:
+            audio_array (np.ndarray): Mono samples at self.sampling_rate
+            batch_size (int, optional): Windows per batch. Defaults to the hardware profile.
+            use_vad (bool): Drop silence and cut windows at pauses
+
+        Returns:
+            str: The transcript ("" when no speech is found)
+        """
+        if use_vad:
+            # Drop silence and cut the speech into windows at pauses
+            chunks = [
+                window["audio"]
+                for window in speech_windows(audio_array, self.sampling_rate, self.chunk_length_s)
+            ]
+            if not chunks:
+                return ""
+        else:
             # Calculate chunk size in samples
             chunk_size = self.chunk_length_s * self.sampling_rate
             total_samples = len(audio_array)
@@ -40,50 +102,129 @@ class AudioTranscriptor:
                 audio_array[i : i + chunk_size] 
                 for i in range(0, total_samples, chunk_size)
             ]
+        
+        return " ".join(self.decode_windows(chunks, batch_size))
+
+    def decode_windows(self, chunks: List, batch_size: Optional[int] = None,
+                       timestamps: bool = False) -> List:
+        """
+        Decode windows of at most 30 s, batch_size at a time
+
+        Args:
+            chunks (list): 16 kHz mono windows
+            batch_size (int, optional): Windows per batch. Defaults to the hardware profile.
+            timestamps (bool): Predict Whisper's segment timestamps
+
+        Returns:
+            list: One stripped text per window, or with timestamps one list per
+                window of {"text", "timestamp": (start_s, end_s)} relative to the window
+        """
+        batch_size = batch_size or load_profile()["whisper"]["batch_size"]
+        apply_torch_threads("whisper")
+
+        # Process chunks in batches
+        transcriptions = []
+        for batch_idx in range(0, len(chunks), batch_size):
+            batch = chunks[batch_idx : batch_idx + batch_size]
+            
+            # Process batch
+            inputs = self.processor(
+                batch,
+                sampling_rate=self.sampling_rate,
+                return_tensors="pt",
+                padding=True,
+                truncation=True
+            ).input_features.to(self.device)
             
-            # Process chunks in batches
-            transcriptions = []
-            for batch_idx in range(0, len(chunks), batch_size):
-                batch = chunks[batch_idx : batch_idx + batch_size]
-                
-                # Process batch
-                inputs = self.processor(
-                    batch,
-                    sampling_rate=self.sampling_rate,
-                    return_tensors="pt",
-                    padding=True,
-                    truncation=True
-                ).input_features.to(self.device)
-                
-                # Generate predictions
-                with torch.inference_mode():
-                    predicted_ids = self.model.generate(inputs)
-                
-                # Decode predictions
-                batch_transcriptions = self.processor.batch_decode(
-                    predicted_ids, 
-                    skip_special_tokens=True
-                )
-                
-                transcriptions.extend(batch_transcriptions)
+            # Generate predictions
+            with torch.inference_mode():
+                predicted_ids = self.model.generate(inputs, return_timestamps=timestamps)
             
-            return " ".join(transcriptions)
+            # Decode predictions
+            batch_transcriptions = self.processor.batch_decode(
+                predicted_ids, 
+                skip_special_tokens=True,
+                output_offsets=timestamps
+            )
+            
+            transcriptions.extend(batch_transcriptions)
+        
+        if timestamps:
+            return [decoded["offsets"] for decoded in transcriptions]
+        return [text.strip() for text in transcriptions]
+
+    def transcribe_segments(self, audio_array, 
+                  batch_size: Optional[int] = None, 
+                  overlap_s: float = 5.0,
+                  use_vad: bool = True) -> List[Dict]:
+        """
+        Timestamped transcription over overlapping windows
+
+        Windows of chunk_length_s overlap by overlap_s, so a word cut at one
+        window's edge is whole in the next. The segments of neighbouring
+        windows are merged by stitch_segments, which keeps one copy of the
+        speech both windows decoded.
+
+        Args:
+            audio_array (np.ndarray): Mono samples at self.sampling_rate
+            batch_size (int, optional): Windows per batch. Defaults to the hardware profile.
+            overlap_s (float): Audio shared by consecutive windows
+            use_vad (bool): Skip windows without speech
+
+        Returns:
+            list: {"start", "end", "text"} per segment, times in seconds from
+                the start of the recording
+        """
+        window = int(self.chunk_length_s * self.sampling_rate)
+        stride = window - int(overlap_s * self.sampling_rate)
+        if stride <= 0:
+            raise ValueError("overlap_s must be shorter than chunk_length_s")
+        duration = len(audio_array) / self.sampling_rate
+
+        offsets = [0]
+        while offsets[-1] + window < len(audio_array):
+            offsets.append(offsets[-1] + stride)
+
+        windows = []
+        for index, offset in enumerate(offsets):
+            chunk = audio_array[offset : offset + window]
+            if use_vad and not speech_segments(chunk, self.sampling_rate):
+                continue
+            start_s = offset / self.sampling_rate
+            # Halfway through the overlaps with the previous and next windows
+            keep_from = start_s + overlap_s / 2 if index > 0 else 0.0
+            keep_to = (offsets[index + 1] / self.sampling_rate + overlap_s / 2
+                       if index + 1 < len(offsets) else float("inf"))
+            windows.append({"audio": chunk, "start_s": start_s, "length_s": len(chunk) / self.sampling_rate,
+                            "keep_from": keep_from, "keep_to": keep_to, "next_start_s": None})
+        if not windows:
+            return []
+        for window_info, next_window in zip(windows, windows[1:]):
+            # A skipped window leaves no overlap to finish a cut segment
+            if next_window["start_s"] < window_info["start_s"] + window_info["length_s"]:
+                window_info["next_start_s"] = next_window["start_s"]
+
+        decoded = self.decode_windows([window_info["audio"] for window_info in windows], batch_size, timestamps=True)
+        for window_info, window_segments in zip(windows, decoded):
+            window_info["segments"] = window_segments
+        return stitch_segments(windows, duration)
+
+    def whisper_transcribe(self, audio_path: str, 
+                  batch_size: Optional[int] = None, 
+                  return_timestamps: bool = False,
+                  use_vad: bool = True):
+        try:
+            # Load and resample audio
+            audio_array, _ = librosa.load(audio_path, sr=self.sampling_rate)
+            if return_timestamps:
+                return self.transcribe_segments(audio_array, batch_size, use_vad=use_vad)
+            return self.transcribe_array(audio_array, batch_size, use_vad)
         
         except Exception as e:
             print(f"Transcription error: {e}")
             return None
 
-    def whisper_transcribe_with_timestamps(self, audio_path: str) -> List[Dict]:
-        """Advanced method with timestamp support"""
-        # Implementation would require custom timestamp alignment
-        # This is a simplified version using the pipeline approach
-        pipe = pipeline(
-            "automatic-speech-recognition",
-            model=self.model,
-            feature_extractor=self.processor.feature_extractor,
-            tokenizer=self.processor.tokenizer,
-            chunk_length_s=30,
-            device=self.device,
-        )
-        
-        return pipe(audio_path, return_timestamps=True)["chunks"]
\ No newline at end of file
+    def whisper_transcribe_with_timestamps(self, audio_path: str, overlap_s: float = 5.0) -> List[Dict]:
+        """Timestamped transcription of a file with the loaded model (see transcribe_segments)"""
+        audio_array, _ = librosa.load(audio_path, sr=self.sampling_rate)
+        return self.transcribe_segments(audio_array, overlap_s=overlap_s)
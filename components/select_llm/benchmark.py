@@ -0,0 +1,110 @@
+"""
+Benchmark llama_cpp decoding speed with and without speculative decoding.
+
+Runs the document summarization prompt on the sample text of
+doc_pipeline/doc_ex.py, a copy-heavy task, and reports generated tokens per
+second for each mode. Decoding is greedy, so every mode should produce the
+same text; the report flags any mismatch.
+
+Usage:
+    python -m components.select_llm.benchmark --model-path qwen2.5-0.5b-instruct-q8_0.gguf
+    python -m components.select_llm.benchmark --model-path main.gguf --draft-model-path draft.gguf
+"""
+import argparse
+import gc
+import time
+
+from . import llama_cpp
+
+def _prompt():
+    from ..doc_pipeline.doc_ex import ex_text
+    from ..doc_pipeline.pipeline import DocumentProcessor
+
+    processor = DocumentProcessor(llm=None, provider="llama_cpp", use_cache=False)
+    return processor.summarize_prompt.invoke({"text": ex_text}).to_string()
+
+def _close(llm):
+    # The tier registry keeps every context size (and its draft model) alive
+    # until the set is forgotten, so close them explicitly between modes
+    for model in llama_cpp.forget_tiers(llm):
+        draft = getattr(getattr(model.client, "draft_model", None), "model", None)
+        for client in (model.client, draft):
+            if client is not None and callable(getattr(client, "close", None)):
+                client.close()
+
+def run_mode(model_path, prompt, speculative=None, num_pred_tokens=10, draft_model_path=None,
+             max_tokens=512, repeats=2):
+    """
+    Time greedy generation for one decoding mode
+
+    Args:
+        model_path (str): GGUF of the main model
+        prompt (str): Prompt to complete
+        speculative (str, optional): None, "prompt_lookup" or "draft"
+        num_pred_tokens (int): Tokens proposed per speculative step
+        draft_model_path (str, optional): Draft GGUF for "draft"
+        max_tokens (int): Tokens to generate per run
+        repeats (int): Timed runs; the best one is reported
+
+    Returns:
+        dict: mode, generated tokens, best seconds, tokens/sec and the output text
+    """
+    llm = llama_cpp.set_llm(
+        model_path=model_path,
+        speculative=speculative,
+        num_pred_tokens=num_pred_tokens,
+        draft_model_path=draft_model_path
+    )[0]
+    llm = llama_cpp.fit_context(llm, prompt, max_tokens)
+    model = llm.client
+
+    best = None
+    for _ in range(repeats):
+        # Reset so every run pays the same prompt evaluation
+        model.reset()
+        start = time.perf_counter()
+        completion = model.create_completion(prompt, max_tokens=max_tokens, temperature=0.0, top_k=1)
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best[0]:
+            best = (seconds, completion)
+
+    seconds, completion = best
+    generated = completion["usage"]["completion_tokens"]
+    _close(llm)
+    del llm, model
+    gc.collect()
+    return {
+        "mode": speculative or "baseline",
+        "tokens": generated,
+        "seconds": round(seconds, 3),
+        "tokens_per_s": round(generated / seconds, 2) if seconds else float("nan"),
+        "text": completion["choices"][0]["text"],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark speculative decoding for llama_cpp")
+    parser.add_argument("--model-path", required=True, help="GGUF of the main model")
+    parser.add_argument("--draft-model-path", default=None, help="Also benchmark a draft GGUF")
+    parser.add_argument("--num-pred-tokens", type=int, default=10)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--repeats", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    modes = [None, "prompt_lookup"] + (["draft"] if args.draft_model_path else [])
+    prompt = _prompt()
+
+    results = [
+        run_mode(args.model_path, prompt, mode, args.num_pred_tokens, args.draft_model_path,
+                 args.max_tokens, args.repeats)
+        for mode in modes
+    ]
+
+    baseline = results[0]
+    print(f"{'mode':<15}{'tokens':>8}{'seconds':>10}{'tok/s':>10}{'speedup':>9}  same output")
+    for result in results:
+        speedup = result["tokens_per_s"] / baseline["tokens_per_s"] if baseline["tokens_per_s"] else float("nan")
+        print(f"{result['mode']:<15}{result['tokens']:>8}{result['seconds']:>10}"
+              f"{result['tokens_per_s']:>10}{speedup:>8.2f}x  {result['text'] == baseline['text']}")
+
+if __name__ == "__main__":
+    main()
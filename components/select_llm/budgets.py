@@ -0,0 +1,214 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from ..doc_pipeline.cache import DEFAULT_CACHE_DIR
+
+# Output token ceilings per pipeline stage, used until enough outputs of a
+# stage have been observed to calibrate its budget
+DEFAULT_BUDGETS = {
+    "summarize": 4096,
+    "merge": 4096,
+    "learning_gap": 2048,
+    "question_gen": 768,
+    "judge": 3072,
+    "transcript": 2048,
+    "summary_notes": 2048,
+    "key_vocab": 768,
+    "supplementary_qa": 1536,
+}
+DEFAULT_BUDGET = 2048
+
+# Field holding the output token limit on each provider's LangChain class
+MAX_TOKENS_FIELD = {
+    "google_genai": "max_output_tokens",
+    "build_nvidia": "max_tokens",
+    "ollama": "num_predict",
+    "llama_cpp": "max_tokens",
+}
+
+class TokenBudgets:
+    """
+    Per-task output token budgets calibrated from observed output lengths.
+
+    Every generation records how many tokens the task produced, counted in
+    the provider's own tokens (select_llm.client skips outputs it cannot
+    count that way). Once a task has min_samples observations, its budget
+    becomes the chosen percentile of its recent outputs times headroom, so
+    normal answers fit while runaway generations are cut. An output that hit its budget is counted at the
+    length it was cut at, so when such outputs reach the percentile the
+    budget grows one headroom step (budget x headroom, up to the ceiling)
+    rather than jumping straight back to the ceiling.
+    """
+
+    def __init__(self, path=None, percentile=0.99, headroom=1.25, window=200, min_samples=20,
+                 floor=256, ceiling=8192):
+        """
+        Initialize the budget table
+
+        Args:
+            path (str, optional): SQLite database of observed output lengths
+            percentile (float): Output length percentile the budget covers
+            headroom (float): Multiplier applied to that percentile
+            window (int): Number of recent outputs per task considered
+            min_samples (int): Outputs needed before a default budget is replaced
+            floor (int): Smallest budget ever returned
+            ceiling (int): Largest budget ever returned (the provider maximum)
+        """
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "budgets.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.percentile = percentile
+        self.headroom = headroom
+        self.window = window
+        self.min_samples = min_samples
+        self.floor = floor
+        self.ceiling = ceiling
+
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outputs (
+                    task TEXT,
+                    tokens INTEGER,
+                    truncated INTEGER,
+                    created REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS outputs_task ON outputs (task, created)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _samples(self, task):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT tokens, truncated FROM outputs WHERE task = ? ORDER BY created DESC LIMIT ?",
+                (task, self.window)
+            ).fetchall()
+
+    def _calibrate(self, task):
+        samples = self._samples(task)
+        if len(samples) < self.min_samples:
+            return min(DEFAULT_BUDGETS.get(task, DEFAULT_BUDGET), self.ceiling)
+        # A truncated output's full length is unknown; the length it was cut
+        # at, times headroom, is the next step up
+        lengths = sorted(tokens for tokens, _ in samples)
+        rank = min(len(lengths) - 1, int(self.percentile * len(lengths)))
+        return max(self.floor, min(self.ceiling, int(lengths[rank] * self.headroom)))
+
+    def budget(self, task):
+        """
+        Args:
+            task (str): Pipeline stage, e.g. "question_gen"
+
+        Returns:
+            int: Maximum output tokens for the task
+        """
+        with self._lock:
+            if task not in self._budgets:
+                self._budgets[task] = self._calibrate(task)
+            return self._budgets[task]
+
+    def record(self, task, tokens, budget=None):
+        """
+        Store the length of one output and recalibrate the task's budget
+
+        Args:
+            task (str): Pipeline stage
+            tokens (int): Output tokens generated
+            budget (int, optional): Budget the output was generated with; an
+                output reaching it is recorded as truncated
+        """
+        truncated = budget is not None and tokens >= budget * 0.98
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO outputs VALUES (?, ?, ?, ?)",
+                (task, tokens, int(truncated), time.time())
+            )
+            # Keep only the window the calibration looks at
+            conn.execute(
+                """
+                DELETE FROM outputs WHERE task = ? AND rowid NOT IN (
+                    SELECT rowid FROM outputs WHERE task = ? ORDER BY created DESC LIMIT ?
+                )
+                """,
+                (task, task, self.window)
+            )
+        budget = self._calibrate(task)
+        with self._lock:
+            self._budgets[task] = budget
+
+    def clear(self):
+        """Forget all observations and return to the default budgets."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM outputs")
+        with self._lock:
+            self._budgets.clear()
+
+    def stats(self):
+        """
+        Report the budget table
+
+        Returns:
+            dict: task -> {"budget", "samples", "truncated"}
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT task, COUNT(*), COALESCE(SUM(truncated), 0) FROM outputs GROUP BY task"
+            ).fetchall()
+        observed = {task: (count, truncated) for task, count, truncated in rows}
+        return {
+            task: {
+                "budget": self.budget(task),
+                "samples": observed.get(task, (0, 0))[0],
+                "truncated": observed.get(task, (0, 0))[1],
+            }
+            for task in sorted(set(DEFAULT_BUDGETS) | set(observed))
+        }
+
+_default_budgets = None
+_default_lock = threading.Lock()
+
+def get_budgets():
+    """
+    Returns:
+        TokenBudgets: The process-wide budget table
+    """
+    global _default_budgets
+    with _default_lock:
+        if _default_budgets is None:
+            _default_budgets = TokenBudgets()
+        return _default_budgets
+
+def with_budget(llm, provider, max_tokens):
+    """
+    Return a copy of llm limited to max_tokens output tokens.
+
+    The copy is shallow: it shares the loaded model (llama.cpp context,
+    HTTP clients) with the original.
+
+    Args:
+        llm: LangChain LLM or chat model from one of the set_llm functions
+        provider (str): Provider name returned by set_llm
+        max_tokens (int): Output token limit
+
+    Returns:
+        The limited copy, or llm itself for an unknown provider
+    """
+    field = MAX_TOKENS_FIELD.get(provider)
+    if field is None or not hasattr(llm, "model_copy"):
+        return llm
+    return llm.model_copy(update={field: max_tokens})
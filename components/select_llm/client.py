@@ -0,0 +1,417 @@
+import re
+import json
+import hashlib
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .response_cache import ResponseCache
+from .prefix_cache import get_prefix_cache
+from .budgets import get_budgets, with_budget, MAX_TOKENS_FIELD
+
+# Maximum number of requests in flight per provider. A LlamaCpp instance
+# holds a single context and cannot serve concurrent calls; a local Ollama
+# server queues anything beyond its OLLAMA_NUM_PARALLEL slots.
+PROVIDER_CONCURRENCY = {
+    "google_genai": 4,
+    "build_nvidia": 4,
+    "ollama": 2,
+    "llama_cpp": 1,
+}
+DEFAULT_CONCURRENCY = 2
+
+# Ollama models of this family share the local token counter's tokenizer
+LOCAL_TOKENIZER_FAMILY = "qwen2.5"
+
+# Prompt input holding the learning material and transcript block every
+# stage's template starts with (doc_pipeline.retrieval.shared_context)
+SHARED_PREFIX_INPUT = "shared_context"
+
+_response_cache = None
+_deterministic_only = True
+_cache_lock = threading.Lock()
+_slots = {}
+_slots_lock = threading.Lock()
+
+def enable_response_cache(path=None, ttl_seconds=7 * 24 * 3600, max_bytes=256 * 1024 * 1024,
+                          deterministic_only=True):
+    """
+    Turn on the process-wide LLM response cache.
+
+    Args:
+        path (str, optional): SQLite database file
+        ttl_seconds (int): Age after which a cached response is regenerated
+        max_bytes (int): Maximum total size of cached responses
+        deterministic_only (bool): Only cache calls made with temperature 0,
+            where a repeated call would return the same text anyway
+
+    Returns:
+        ResponseCache: The enabled cache
+    """
+    global _response_cache, _deterministic_only
+    with _cache_lock:
+        if _response_cache is None or (path and _response_cache.path != path):
+            _response_cache = ResponseCache(path, ttl_seconds, max_bytes)
+        _response_cache.ttl_seconds = ttl_seconds
+        _response_cache.max_bytes = max_bytes
+        _deterministic_only = deterministic_only
+        return _response_cache
+
+def disable_response_cache():
+    """Turn off the process-wide LLM response cache (stored entries are kept)."""
+    global _response_cache
+    with _cache_lock:
+        _response_cache = None
+
+def get_response_cache():
+    """
+    Returns:
+        ResponseCache or None: The enabled response cache, if any
+    """
+    return _response_cache
+
+def response_text(response):
+    """
+    Normalize a provider response to plain text.
+
+    Chat models (google_genai, build_nvidia) return messages whose content
+    may be a string or a list of parts; completion models (ollama,
+    llama_cpp) return strings.
+
+    Args:
+        response: The value returned by llm.invoke
+
+    Returns:
+        str: The response text
+    """
+    content = getattr(response, "content", response)
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else part.get("text", "")
+            for part in content
+        )
+    return content if isinstance(content, str) else str(content)
+
+CODE_FENCE = re.compile(r"^\s*```[\w-]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+
+def parse_json(text):
+    """
+    Parse JSON from model output that was not constrained to a schema.
+
+    Strips a surrounding Markdown code fence (```json ... ```) and any text
+    around the outermost object or list.
+
+    Args:
+        text (str): Model output
+
+    Returns:
+        dict or list: The parsed value
+
+    Raises:
+        ValueError: If the text holds no valid JSON object or list
+    """
+    fenced = CODE_FENCE.match(text)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if starts:
+        start = min(starts)
+        end = text.rfind("}" if text[start] == "{" else "]")
+        if end > start:
+            try:
+                return json.loads(text[start:end + 1])
+            except json.JSONDecodeError as e:
+                raise ValueError(f"The model returned invalid JSON: {e}") from e
+    raise ValueError("The model returned no JSON")
+
+def model_id(llm):
+    """
+    Returns:
+        str: The model name (or GGUF path) a LangChain LLM was built with
+    """
+    for attribute in ("model", "model_name", "model_path"):
+        value = getattr(llm, attribute, None)
+        if value:
+            return str(value)
+    return type(llm).__name__
+
+def concurrency_limit(provider):
+    """
+    Returns:
+        int: Maximum number of concurrent requests for a provider
+    """
+    return PROVIDER_CONCURRENCY.get(provider, DEFAULT_CONCURRENCY)
+
+def provider_slot(provider):
+    """
+    Returns:
+        threading.BoundedSemaphore: Shared semaphore limiting the calls in
+            flight for a provider to concurrency_limit(provider)
+    """
+    with _slots_lock:
+        if provider not in _slots:
+            _slots[provider] = threading.BoundedSemaphore(concurrency_limit(provider))
+        return _slots[provider]
+
+def run_concurrently(calls, provider, max_workers=None):
+    """
+    Run independent generation calls on a bounded thread pool.
+
+    The model calls themselves are throttled by provider_slot in invoke and
+    stream, so a pool larger than the provider limit only overlaps prompt
+    building and cache lookups.
+
+    Args:
+        calls (dict): Name -> zero-argument callable
+        provider (str): Provider the calls go to
+        max_workers (int, optional): Pool size. Defaults to one thread per
+            call, capped at the provider limit.
+
+    Yields:
+        tuple: (name, result, error) in the order the calls finish; error is
+            the raised exception or None
+    """
+    if not calls:
+        return
+    workers = max_workers or min(len(calls), concurrency_limit(provider))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(call): name for name, call in calls.items()}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+
+def _sampling_params(llm):
+    return {
+        "temperature": getattr(llm, "temperature", None),
+        "seed": getattr(llm, "seed", None),
+    }
+
+def _cache_key(provider, llm, prompt_text, params):
+    payload = json.dumps({
+        "provider": provider,
+        "model": model_id(llm),
+        "params": params,
+        "prompt": hashlib.sha256(prompt_text.encode("utf-8")).hexdigest(),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _cacheable(params):
+    cache = _response_cache
+    if cache is None:
+        return None
+    if _deterministic_only and params.get("temperature") not in (0, 0.0):
+        return None
+    return cache
+
+def _reuse_prefix(llm, provider, inputs, prompt_text):
+    # Only llama.cpp runs in-process; its evaluated prefix can be restored
+    prefix = inputs.get(SHARED_PREFIX_INPUT)
+    if provider == "llama_cpp" and prefix and prompt_text.startswith(prefix):
+        get_prefix_cache().prepare(llm, prefix)
+
+@lru_cache(maxsize=16)
+def _grammar(schema_json):
+    from llama_cpp import LlamaGrammar
+    return LlamaGrammar.from_json_schema(schema_json, verbose=False)
+
+def _constraint_kwargs(provider, schema):
+    # Local providers take the schema as decoding constraints on llm.invoke/stream
+    if schema is None:
+        return {}
+    if provider == "llama_cpp":
+        return {"grammar": _grammar(json.dumps(schema, sort_keys=True))}
+    if provider == "ollama":
+        return {"format": schema}
+    return {}
+
+def _budgeted(llm, provider, task, prompt_text):
+    max_tokens = get_budgets().budget(task) if task is not None else None
+    if provider == "llama_cpp":
+        from . import llama_cpp
+        # Run on the smallest context tier the prompt and output fit in
+        output_tokens = max_tokens or getattr(llm, MAX_TOKENS_FIELD[provider])
+        llm = llama_cpp.fit_context(llm, prompt_text, output_tokens)
+    if max_tokens is None:
+        return llm, None
+    return with_budget(llm, provider, max_tokens), max_tokens
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return usage.get("output_tokens") if usage else None
+
+def _output_tokens(llm, provider, text, usage_tokens=None):
+    # Budgets are enforced in the provider's own tokens, so outputs are
+    # counted in those: the reported usage, or the local model's tokenizer
+    if usage_tokens is not None:
+        return usage_tokens
+    if provider == "llama_cpp" and hasattr(getattr(llm, "client", None), "tokenize"):
+        return len(llm.client.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+    if provider == "ollama" and LOCAL_TOKENIZER_FAMILY in str(getattr(llm, "model", "")).lower():
+        from ..doc_pipeline.tokens import count_tokens
+        return count_tokens(text)
+    # Unknown tokenizer: a count in Qwen tokens would miscalibrate the budget
+    return None
+
+def _record_output(task, output_tokens, max_tokens):
+    if task is None or output_tokens is None:
+        return
+    get_budgets().record(task, output_tokens, max_tokens)
+
+def invoke(llm, provider, prompt, inputs, use_cache=True, task=None):
+    """
+    Run a prompt template through any provider and return plain text.
+
+    Replaces the per-component `prompt | llm` chains and the provider
+    branches that unpacked their results. When the response cache is
+    enabled, identical calls (same provider, model, sampling parameters
+    and rendered prompt) are answered from the cache.
+
+    Args:
+        llm: LangChain LLM or chat model from one of the set_llm functions
+        provider (str): Provider name returned by set_llm
+        prompt: LangChain PromptTemplate
+        inputs (dict): Values for the template variables
+        use_cache (bool): Set to False to always call the model
+        task (str, optional): Pipeline stage; limits the output to the
+            stage's calibrated token budget (see budgets.TokenBudgets)
+
+    Returns:
+        str: The response text
+    """
+    prompt_value = prompt.invoke(inputs)
+    params = _sampling_params(llm)
+    cache = _cacheable(params) if use_cache else None
+
+    key = None
+    if cache is not None:
+        key = _cache_key(provider, llm, prompt_value.to_string(), params)
+        text = cache.get(key)
+        if text is not None:
+            return text
+
+    limited, max_tokens = _budgeted(llm, provider, task, prompt_value.to_string())
+    with provider_slot(provider):
+        _reuse_prefix(limited, provider, inputs, prompt_value.to_string())
+        response = limited.invoke(prompt_value)
+        text = response_text(response)
+    _record_output(task, _output_tokens(limited, provider, text, _usage_tokens(response)), max_tokens)
+
+    if cache is not None:
+        cache.put(key, text, provider, model_id(llm))
+    return text
+
+def invoke_structured(llm, provider, prompt, inputs, schema, use_cache=True, task=None):
+    """
+    Run a prompt template and return its output parsed as JSON matching schema.
+
+    Remote chat models get the schema through with_structured_output; Ollama
+    through its format option; llama_cpp through a GBNF grammar built from the
+    schema, so only valid JSON can be sampled and decoding stops as soon as
+    the top-level object closes.
+
+    Args:
+        llm: LangChain LLM or chat model from one of the set_llm functions
+        provider (str): Provider name returned by set_llm
+        prompt: LangChain PromptTemplate
+        inputs (dict): Values for the template variables
+        schema (dict): JSON schema of the expected output (a top-level object)
+        use_cache (bool): Set to False to always call the model
+        task (str, optional): Pipeline stage whose token budget applies
+
+    Returns:
+        dict: The parsed output
+
+    Raises:
+        ValueError: If the model returned no output or invalid JSON
+    """
+    prompt_value = prompt.invoke(inputs)
+    params = {**_sampling_params(llm), "schema": schema}
+    cache = _cacheable(params) if use_cache else None
+
+    key = None
+    if cache is not None:
+        key = _cache_key(provider, llm, prompt_value.to_string(), params)
+        text = cache.get(key)
+        if text is not None:
+            return json.loads(text)
+
+    limited, max_tokens = _budgeted(llm, provider, task, prompt_value.to_string())
+    with provider_slot(provider):
+        _reuse_prefix(limited, provider, inputs, prompt_value.to_string())
+        if provider in ("llama_cpp", "ollama"):
+            result = limited.invoke(prompt_value, **_constraint_kwargs(provider, schema))
+        else:
+            result = limited.with_structured_output(schema).invoke(prompt_value)
+
+    if result is None:
+        raise ValueError("The model returned no structured output")
+    output_tokens = None  # Remote structured output reports no usage
+    if not isinstance(result, dict):
+        text = response_text(result)
+        output_tokens = _output_tokens(limited, provider, text, _usage_tokens(result))
+        result = parse_json(text)
+        if not isinstance(result, dict):
+            raise ValueError("The model returned JSON that is not an object")
+    _record_output(task, output_tokens, max_tokens)
+
+    if cache is not None:
+        cache.put(key, json.dumps(result), provider, model_id(llm))
+    return result
+
+def stream(llm, provider, prompt, inputs, use_cache=True, schema=None, task=None):
+    """
+    Streaming counterpart of invoke: yield the response text as it is generated.
+
+    A cached response is yielded in one piece; a generated one is stored in
+    the cache once the stream has been fully consumed.
+
+    Args:
+        llm: LangChain LLM or chat model from one of the set_llm functions
+        provider (str): Provider name returned by set_llm
+        prompt: LangChain PromptTemplate
+        inputs (dict): Values for the template variables
+        use_cache (bool): Set to False to always call the model
+        schema (dict, optional): JSON schema constraining the output of the
+            local providers (llama_cpp grammar, Ollama format). Remote chat
+            models only follow the prompt's instructions when streaming.
+        task (str, optional): Pipeline stage whose token budget applies
+
+    Yields:
+        str: Chunks of the response text
+    """
+    prompt_value = prompt.invoke(inputs)
+    params = _sampling_params(llm)
+    constraints = _constraint_kwargs(provider, schema)
+    if constraints:
+        params["schema"] = schema
+    cache = _cacheable(params) if use_cache else None
+
+    key = None
+    if cache is not None:
+        key = _cache_key(provider, llm, prompt_value.to_string(), params)
+        text = cache.get(key)
+        if text is not None:
+            yield text
+            return
+
+    chunks = []
+    usage_tokens = None
+    limited, max_tokens = _budgeted(llm, provider, task, prompt_value.to_string())
+    with provider_slot(provider):
+        _reuse_prefix(limited, provider, inputs, prompt_value.to_string())
+        for chunk in limited.stream(prompt_value, **constraints):
+            chunk_usage = _usage_tokens(chunk)
+            if chunk_usage is not None:
+                usage_tokens = (usage_tokens or 0) + chunk_usage
+            text = response_text(chunk)
+            if text:
+                chunks.append(text)
+                yield text
+    _record_output(task, _output_tokens(limited, provider, "".join(chunks), usage_tokens), max_tokens)
+
+    if cache is not None:
+        cache.put(key, "".join(chunks), provider, model_id(llm))
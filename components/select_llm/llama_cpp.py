@@ -2,26 +2,263 @@
 # !huggingface-cli download Qwen/Qwen2.5-0.5B-Instruct-GGUF qwen2.5-0.5b-instruct-q8_0.gguf --local-dir . --local-dir-use-symlinks False
 
 import os
+import threading
 from langchain_community.llms import LlamaCpp
 
+from ..tuning.profile import load_profile
+
+SPECULATIVE_MODES = ("prompt_lookup", "draft")
+
+# Context sizes a model can be loaded with. The KV cache grows linearly with
+# n_ctx, so each request runs on the smallest tier its prompt and output fit in.
+CONTEXT_TIERS = (4096, 8192, 16384, 32768)
+PREWARMED_TIERS = (4096, 8192)
+
+def draft_model(speculative, num_pred_tokens=10, draft_model_path=None, n_ctx=CONTEXT_TIERS[0]):
+    """
+    Build the llama-cpp-python draft model for speculative decoding.
+
+    Args:
+        speculative (str): "prompt_lookup" proposes continuations by matching
+            the last tokens against the prompt, which pays off when the output
+            copies spans of the input (summaries, notes). "draft" runs a small
+            GGUF sharing the main model's vocabulary.
+        num_pred_tokens (int): Tokens proposed per step
+        draft_model_path (str, optional): GGUF of the draft model, for "draft"
+        n_ctx (int): Context of the draft model; the main model's tier, since
+            the draft never sees more tokens than the main model holds
+
+    Returns:
+        LlamaDraftModel: Draft model to pass to Llama(draft_model=...)
+    """
+    if speculative == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+        return LlamaPromptLookupDecoding(num_pred_tokens=num_pred_tokens)
+    if speculative == "draft":
+        if not draft_model_path:
+            raise ValueError("speculative='draft' needs draft_model_path")
+        return GGUFDraftModel(draft_model_path, num_pred_tokens=num_pred_tokens, n_ctx=n_ctx)
+    raise ValueError(f"Unknown speculative mode '{speculative}'. Choose from {SPECULATIVE_MODES}.")
+
+class GGUFDraftModel:
+    """
+    Greedy draft proposals from a small GGUF (e.g. a Q4 quant of the same family).
+
+    Implements the llama-cpp-python LlamaDraftModel interface: called with the
+    tokens so far, it returns the next num_pred_tokens tokens it predicts.
+    The main model then verifies them in a single batch.
+    """
+
+    def __init__(self, model_path, num_pred_tokens=4, n_ctx=CONTEXT_TIERS[0]):
+        from llama_cpp import Llama
+        self.num_pred_tokens = num_pred_tokens
+        self.model = Llama(model_path=model_path, n_ctx=n_ctx, n_gpu_layers=0, verbose=False)
+
+    def __call__(self, input_ids, /, **kwargs):
+        import numpy as np
+        draft = []
+        # generate() reuses the evaluated prefix, so only new tokens are processed
+        for token in self.model.generate(input_ids.tolist(), top_k=1, temp=0.0, reset=True):
+            if token == self.model.token_eos():
+                break
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+def kv_cache_bytes(model, n_tokens):
+    """
+    Size of the KV cache holding n_tokens for a llama.cpp model (f16 cache).
+
+    Args:
+        model: llama_cpp.Llama instance
+        n_tokens (int): Number of cached tokens (n_ctx for the allocation)
+
+    Returns:
+        int: Bytes, or 0 if the GGUF metadata lacks the attention shape
+    """
+    metadata = getattr(model, "metadata", None) or {}
+    arch = metadata.get("general.architecture", "")
+    try:
+        n_layer = int(metadata[f"{arch}.block_count"])
+        n_embd = int(metadata[f"{arch}.embedding_length"])
+        n_head = int(metadata[f"{arch}.attention.head_count"])
+        n_head_kv = int(metadata.get(f"{arch}.attention.head_count_kv", n_head))
+    except (KeyError, ValueError):
+        return 0
+    # K and V, per layer, per KV head, 2 bytes per f16 value
+    return 2 * n_layer * n_head_kv * (n_embd // n_head) * 2 * n_tokens
+
+class ContextTiers:
+    """
+    The same GGUF loaded at several context sizes.
+
+    Weights are memory-mapped, so the tiers share them and each loaded tier
+    only adds its own KV cache. The smaller tiers are loaded up front; larger
+    ones on the first request that needs them.
+    """
+
+    def __init__(self, build, tiers=CONTEXT_TIERS, prewarm=PREWARMED_TIERS):
+        """
+        Args:
+            build (callable): n_ctx -> LlamaCpp
+            tiers (tuple): Available context sizes
+            prewarm (tuple): Tiers loaded immediately
+        """
+        self.build = build
+        self.tiers = tuple(sorted(tiers))
+        self.last_request = None
+        self._models = {}
+        self._lock = threading.Lock()
+        for n_ctx in prewarm:
+            if n_ctx in self.tiers:
+                self.get(n_ctx)
+
+    def get(self, n_ctx):
+        """
+        Returns:
+            LlamaCpp: The model loaded with context n_ctx, loading it if needed
+        """
+        with self._lock:
+            if n_ctx not in self._models:
+                llm = self.build(n_ctx)
+                self._models[n_ctx] = llm
+                _tiers_by_model[id(llm.client)] = self
+            return self._models[n_ctx]
+
+    def tier_for(self, n_tokens):
+        """
+        Returns:
+            int: The smallest tier holding n_tokens (the largest tier if none does)
+        """
+        return next((n_ctx for n_ctx in self.tiers if n_ctx >= n_tokens), self.tiers[-1])
+
+    def loaded(self):
+        """
+        Returns:
+            list: The loaded LlamaCpp instances, smallest context first
+        """
+        with self._lock:
+            return [self._models[n_ctx] for n_ctx in sorted(self._models)]
+
+    def report(self, n_ctx, prompt_tokens, max_tokens):
+        model = self._models[n_ctx].client
+        self.last_request = {
+            "n_ctx": n_ctx,
+            "prompt_tokens": prompt_tokens,
+            "max_tokens": max_tokens,
+            "kv_allocated_mb": round(kv_cache_bytes(model, n_ctx) / 2**20, 1),
+            "kv_needed_mb": round(kv_cache_bytes(model, prompt_tokens + max_tokens) / 2**20, 1),
+            "kv_loaded_mb": round(sum(
+                kv_cache_bytes(llm.client, tier) for tier, llm in self._models.items()
+            ) / 2**20, 1),
+        }
+        print(f"llama_cpp: {prompt_tokens} prompt + {max_tokens} output tokens on the {n_ctx} tier, "
+              f"KV cache {self.last_request['kv_allocated_mb']} MB "
+              f"({self.last_request['kv_loaded_mb']} MB across loaded tiers)")
+        return self.last_request
+
+_tiers_by_model = {}
+
+def context_tiers(llm):
+    """
+    Returns:
+        ContextTiers or None: The tier set a LlamaCpp instance (or a copy of it) belongs to
+    """
+    return _tiers_by_model.get(id(getattr(llm, "client", None)))
+
+def fit_context(llm, prompt, max_tokens):
+    """
+    Pick the LlamaCpp instance whose context fits a request.
+
+    Args:
+        llm: LlamaCpp instance returned by set_llm (or a copy of it)
+        prompt (str): The rendered prompt
+        max_tokens (int): Output token budget of the request
+
+    Returns:
+        LlamaCpp: The smallest loaded-or-loadable tier fitting prompt + max_tokens,
+            or llm itself if it was not built by set_llm
+    """
+    tiers = context_tiers(llm)
+    if tiers is None:
+        return llm
+    prompt_tokens = len(llm.client.tokenize(prompt.encode("utf-8"), add_bos=True, special=True))
+    n_ctx = tiers.tier_for(prompt_tokens + max_tokens)
+    tiers.report(n_ctx, prompt_tokens, max_tokens)
+    return tiers.get(n_ctx)
+
+def forget_tiers(llm):
+    """
+    Drop the tier set of llm so its models can be freed.
+
+    Returns:
+        list: Every loaded LlamaCpp instance of the set (just [llm] if it has none)
+    """
+    tiers = context_tiers(llm)
+    if tiers is None:
+        return [llm]
+    models = tiers.loaded()
+    for model in models:
+        _tiers_by_model.pop(id(model.client), None)
+    return models
+
 def set_llm(
         model_path: str = "/home/prasun/Desktop/ADHYAYAN_MITRA/qwen2.5-0.5b-instruct-q8_0.gguf",
+        speculative: str = None,
+        num_pred_tokens: int = 10,
+        draft_model_path: str = None,
+        n_ctx_tiers: tuple = CONTEXT_TIERS,
+        prewarm: tuple = PREWARMED_TIERS,
+        n_batch: int = None,
+        n_threads: int = None,
+        n_gpu_layers: int = None,
 ):
     """
     Set the LLM to use based on user input.
     Args:
         model (str): The model to use. Default is "path to qwen2.5-0.5b-instruct-q8_0.gguf".
         Choose model by typing ollama list in terminal.
+        speculative (str): Optional speculative decoding mode, "prompt_lookup" or "draft".
+        Greedy outputs are unchanged; only the decoding speed differs.
+        num_pred_tokens (int): Tokens proposed per speculative step.
+        draft_model_path (str): Draft GGUF for speculative="draft".
+        n_ctx_tiers (tuple): Context sizes requests are routed between (see fit_context).
+        prewarm (tuple): Tiers loaded now; the others load on first use.
+        n_batch (int): Prompt tokens evaluated per batch.
+        n_threads (int): CPU threads for generation.
+        n_gpu_layers (int): Layers offloaded to the GPU (0 for CPU-only inference).
+        n_batch, n_threads and n_gpu_layers default to the hardware profile
+        (python -m components.tuning.tune).
     Returns:
-        llm: The selected LLM.
-    """
-    llm = LlamaCpp(
-        model_path=model_path,  # Path to your downloaded GGUF file
-        temperature=0.0,  # Set as needed
-        n_ctx=32768,       # Context window, adjust as needed
-        max_tokens=8192,   # Max tokens for the response
-        n_batch = 64,
-        n_gpu_layers=0,   # 0 for CPU-only inference
-        verbose=False  
-    )
-    return [llm, model_path, "llama_cpp"]
\ No newline at end of file
+        llm: The selected LLM, loaded with the smallest pre-warmed context.
+    """
+    tuned = load_profile()["llama_cpp"]
+    n_batch = n_batch or tuned["n_batch"]
+    n_threads = n_threads or tuned["n_threads"]
+    n_gpu_layers = tuned["n_gpu_layers"] if n_gpu_layers is None else n_gpu_layers
+
+    # Prompt evaluation is compute bound and may use more threads than generation
+    n_threads_batch = tuned.get("n_threads_batch", n_threads)
+
+    def build(n_ctx):
+        model_kwargs = {"n_threads_batch": n_threads_batch}
+        if speculative:
+            # One draft per tier, with that tier's context, so its KV cache
+            # scales with the tier like the main model's
+            model_kwargs["draft_model"] = draft_model(speculative, num_pred_tokens, draft_model_path, n_ctx)
+        return LlamaCpp(
+            model_path=model_path,  # Path to your downloaded GGUF file
+            temperature=0.0,  # Set as needed
+            n_ctx=n_ctx,       # Context window, picked per request from context_tiers
+            max_tokens=min(8192, n_ctx // 2),   # Max tokens for the response
+            n_batch = n_batch,
+            n_threads=n_threads,
+            n_gpu_layers=n_gpu_layers,   # 0 for CPU-only inference
+            verbose=False,
+            model_kwargs=model_kwargs
+        )
+
+    tiers = ContextTiers(build, n_ctx_tiers, prewarm)
+    llm = tiers.get(min(prewarm or tiers.tiers))
+    return [llm, model_path, "llama_cpp"]
@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+class PrefixStateCache:
+    """
+    Saved llama.cpp states after evaluating a shared prompt prefix.
+
+    Every pipeline stage opens its prompt with the same learning material and
+    transcript block (doc_pipeline.retrieval.shared_context). The first stage
+    evaluates that block once and its state is saved; later stages restore it
+    so llama.cpp only has to process the stage-specific instructions, even
+    when other prompts (document summaries, a different stage) ran in between.
+    """
+
+    def __init__(self, max_entries=2, min_tokens=64):
+        """
+        Initialize the prefix state cache
+
+        Args:
+            max_entries (int): Number of prefix states kept (each holds the KV
+                cache of its prefix, roughly n_tokens * n_layers * kv_dim bytes)
+            min_tokens (int): Shorter prefixes are not worth a saved state
+        """
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.tokens_reused = 0
+
+    def prepare(self, llm, prefix):
+        """
+        Load the evaluated state of a prompt prefix into a LlamaCpp model.
+
+        Must be called right before the model runs a prompt starting with
+        prefix, while holding the provider slot (the model holds one context).
+
+        Args:
+            llm: LangChain LlamaCpp instance
+            prefix (str): Text the next prompt starts with
+
+        Returns:
+            int: Number of prefix tokens llama.cpp will not re-evaluate
+        """
+        model = getattr(llm, "client", None)
+        if model is None or not prefix:
+            return 0
+
+        # The last token may merge with the text that follows the prefix
+        tokens = model.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)[:-1]
+        if len(tokens) < self.min_tokens:
+            return 0
+
+        with self._lock:
+            if model.n_tokens >= len(tokens) and model.input_ids[:len(tokens)].tolist() == tokens:
+                # Still in the context from the previous call
+                self.hits += 1
+                self.tokens_reused += len(tokens)
+                return len(tokens)
+
+            key = (id(model), hash(tuple(tokens)))
+            state = self._states.get(key)
+            if state is not None:
+                model.load_state(state)
+                self._states.move_to_end(key)
+                self.hits += 1
+                self.tokens_reused += len(tokens)
+                return len(tokens)
+
+            # First stage: evaluate the prefix on its own and save the state
+            self.misses += 1
+            model.reset()
+            model.eval(tokens)
+            self._states[key] = model.save_state()
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+            return 0
+
+    def forget(self, llm):
+        """Drop the states saved for a model (call when it is unloaded)."""
+        model = getattr(llm, "client", None)
+        with self._lock:
+            for key in [key for key in self._states if key[0] == id(model)]:
+                del self._states[key]
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, prefix tokens not re-evaluated and saved states
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "tokens_reused": self.tokens_reused,
+                "states": len(self._states),
+            }
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_prefix_cache():
+    """
+    Returns:
+        PrefixStateCache: The process-wide prefix state cache
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PrefixStateCache()
+        return _default_cache
@@ -0,0 +1,184 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from . import google_genai, build_nvidia, ollama, llama_cpp, client
+from .prefix_cache import get_prefix_cache
+
+FACTORIES = {
+    "google_genai": google_genai.set_llm,
+    "build_nvidia": build_nvidia.set_llm,
+    "ollama": ollama.set_llm,
+    "llama_cpp": llama_cpp.set_llm,
+}
+
+_instances = {}
+_holders = {}
+_key_locks = {}
+_lock = threading.Lock()
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _key(provider, params):
+    items = []
+    for name, value in sorted(params.items()):
+        if "api" in name and value:
+            # Keep API keys out of the registry keys
+            value = hashlib.sha256(str(value).encode("utf-8")).hexdigest()
+        items.append((name, _freeze(value)))
+    return (provider, tuple(items))
+
+def get_llm(provider, holder=None, **params):
+    """
+    Return the loaded LLM for a provider and parameters, loading it once per process.
+
+    Streamlit re-executes Home.py on every widget interaction; going through
+    the registry keeps one client per (provider, params) for all sessions
+    instead of rebuilding it (and, for llama_cpp, reloading the GGUF and its
+    KV cache) on each rerun.
+
+    Args:
+        provider (str): One of FACTORIES
+        holder (str, optional): Id of the session using the client. Held
+            clients are only unloaded by release once no holder is left.
+        **params: Keyword arguments for the provider's set_llm
+
+    Returns:
+        list: [llm, model_name, provider], as returned by set_llm
+    """
+    if provider not in FACTORIES:
+        raise ValueError(f"Unknown provider '{provider}'. Choose from {list(FACTORIES)}.")
+
+    key = _key(provider, params)
+    with _lock:
+        config = _instances.get(key)
+        if config is not None:
+            _hold(key, holder)
+            return config
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    # Loading can take seconds; only callers asking for the same key wait
+    with key_lock:
+        with _lock:
+            config = _instances.get(key)
+        if config is None:
+            config = FACTORIES[provider](**params)
+        with _lock:
+            _instances[key] = config
+            _hold(key, holder)
+        return config
+
+def _hold(key, holder):
+    if holder is not None:
+        _holders.setdefault(key, set()).add(holder)
+
+@contextmanager
+def _idle(provider):
+    # Take every call slot of the provider, so no generation is running
+    # on the model while it is closed
+    slot = client.provider_slot(provider)
+    limit = client.concurrency_limit(provider)
+    for _ in range(limit):
+        slot.acquire()
+    try:
+        yield
+    finally:
+        for _ in range(limit):
+            slot.release()
+
+def _release(config):
+    # A llama_cpp model may be loaded at several context sizes
+    with _idle(config[2]):
+        models = llama_cpp.forget_tiers(config[0]) if config[2] == "llama_cpp" else [config[0]]
+        for llm in models:
+            get_prefix_cache().forget(llm)
+            close = getattr(getattr(llm, "client", None), "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    print(f"Error releasing {config[1]}: {e}")
+
+def _pop(keys):
+    # Call with _lock held
+    configs = [_instances.pop(key) for key in keys if key in _instances]
+    for key in keys:
+        _key_locks.pop(key, None)
+        _holders.pop(key, None)
+    return configs
+
+def unload(provider=None, **params):
+    """
+    Drop loaded LLMs so their memory can be reclaimed, whoever holds them.
+
+    For scripts that own the process; sessions give up their client with
+    release instead.
+
+    Args:
+        provider (str, optional): Only unload this provider. Unloads everything if None.
+        **params: Only unload the instance created with exactly these parameters
+
+    Returns:
+        int: Number of instances unloaded
+    """
+    with _lock:
+        if provider is not None and params:
+            keys = [_key(provider, params)]
+        else:
+            keys = [key for key in _instances if provider is None or key[0] == provider]
+        configs = _pop(keys)
+
+    for config in configs:
+        _release(config)
+    return len(configs)
+
+def instance_key(provider, **params):
+    """
+    Returns:
+        tuple: Registry key of a provider and parameters (API keys hashed)
+    """
+    return _key(provider, params)
+
+def release(holder, key=None, providers=None):
+    """
+    Stop holding clients for a session, unloading those no other session holds.
+
+    Used when a session switches models or variants of the same local model
+    (e.g. with and without speculative decoding), and by its Unload button.
+    Clients still held by another session stay loaded.
+
+    Args:
+        holder (str): Session id passed to get_llm
+        key (tuple, optional): Only release this instance (see instance_key)
+        providers (tuple, optional): Only release instances of these providers
+
+    Returns:
+        tuple: (number of instances unloaded, number still held by other sessions)
+    """
+    with _lock:
+        keys = [
+            held for held, holders in _holders.items()
+            if holder in holders
+            and (key is None or held == key)
+            and (providers is None or held[0] in providers)
+        ]
+        for held in keys:
+            _holders[held].discard(holder)
+        unused = [held for held in keys if not _holders[held]]
+        configs = _pop(unused)
+
+    for config in configs:
+        _release(config)
+    return len(configs), len(keys) - len(unused)
+def loaded():
+    """
+    Returns:
+        list: (provider, model_name) of every loaded instance
+    """
+    with _lock:
+        return [(config[2], config[1]) for config in _instances.values()]
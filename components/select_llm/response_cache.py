@@ -0,0 +1,136 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from ..doc_pipeline.cache import DEFAULT_CACHE_DIR
+
+class ResponseCache:
+    """
+    SQLite-backed cache of LLM responses.
+
+    Entries expire after ttl_seconds and the least recently used ones are
+    evicted once the stored responses exceed max_bytes. A connection is
+    opened per operation, so the cache can be shared by threads and by
+    several processes using the same file.
+    """
+
+    def __init__(self, path=None, ttl_seconds=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        """
+        Initialize the response cache
+
+        Args:
+            path (str, optional): SQLite database file
+            ttl_seconds (int): Age after which an entry is ignored and removed
+            max_bytes (int): Maximum total size of stored responses
+        """
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "responses.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT,
+                    model TEXT,
+                    created REAL,
+                    accessed REAL,
+                    size INTEGER,
+                    response TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """
+        Look up a response
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str or None: The cached response, or None if missing or expired
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created > ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def put(self, key, response, provider="", model=""):
+        """
+        Store a response and evict expired and least recently used entries
+
+        Args:
+            key (str): Cache key
+            response (str): The response text
+            provider (str): Provider that produced the response
+            model (str): Model that produced the response
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, now, now, size, response)
+            )
+            conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+                stale = []
+                for stale_key, stale_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((stale_key,))
+                    total -= stale_size
+                conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """
+        Report cache usage
+
+        Returns:
+            dict: hits, misses, number of entries and total bytes
+        """
+        with self._connect() as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
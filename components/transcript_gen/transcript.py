@@ -3,23 +3,26 @@
 # -> The Generated transcript will be in text format(not any markdown or any special symbols)
 import re
 from langchain.prompts import PromptTemplate
+from ..doc_pipeline.retrieval import shared_context
+from ..select_llm import client
 
-def get_transcript(
-    llm,
-    provider,
+def _transcript_request(
     evaluation_report,
     qna,
     analysis,
     doc_result,
-    trans_result
+    trans_result,
+    doc_index=None,
+    token_budget=None,
+    provider=None
 ):
 
     transcript_prompt = PromptTemplate.from_template(
-        """
+        """{shared_context}
         You are an expert Teaching Assistant dedicated to helping students deeply understand their subject matter.
         Your goal is to create a comprehensive, engaging, and easy-to-follow transcript designed to be read aloud as an educational audio resource.
 
-        Use the provided evaluation report, QnA, gap analysis, document result, and any previous transcripts to:
+        Use the learning material and the student's response above, and the evaluation report, QnA and gap analysis below to:
         - Identify and clearly explain key concepts, especially those where the student has shown misunderstandings or gaps.
         - Address misconceptions directly, using simple language and relatable examples.
         - Reinforce correct knowledge and expand on important points with additional context or analogies.
@@ -39,32 +42,48 @@ def get_transcript(
         {qna}
         Here is the GAP Analysis:
         {analysis}
-        Here is the Document Result:
-        {doc_result}
-        Here is the Previous Transcript:
-        {trans_result}
 
         Now, generate a detailed and engaging transcript that helps the student understand the material, corrects their misconceptions, fills their knowledge gaps, and motivates them to keep learning.
         """
     )
 
-    chain = transcript_prompt | llm
-    transcript = chain.invoke({
+    return transcript_prompt, {
+        "shared_context":shared_context(doc_result, trans_result, doc_index, token_budget, provider, query=f"{analysis}\n{qna}"),
         "evaluation_report":evaluation_report,
         "qna":qna,
-        "analysis":analysis,
-        "doc_result":doc_result,
-        "trans_result":trans_result
+        "analysis":analysis
         }
-    )
-
-    if provider == "google_genai":
-        transcript = transcript.content    
-    elif provider == "llama_cpp":
-        transcript = transcript
-    elif provider == "ollama":
-        transcript = transcript
 
+def clean_transcript(transcript):
     transcript = re.sub(r'[^a-zA-Z0-9\s()+-,.?!$%&\'"]', '', transcript)    
     
-    return transcript
\ No newline at end of file
+    return transcript
+
+def get_transcript(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    prompt, inputs = _transcript_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    return clean_transcript(client.invoke(llm, provider, prompt, inputs, task="transcript"))
+
+def get_transcript_stream(
+    llm,
+    provider,
+    evaluation_report,
+    qna,
+    analysis,
+    doc_result,
+    trans_result,
+    doc_index=None,
+    token_budget=None
+):
+    """Yields the raw transcript as it is generated; pass the joined text through clean_transcript."""
+    prompt, inputs = _transcript_request(evaluation_report, qna, analysis, doc_result, trans_result, doc_index, token_budget, provider)
+    return client.stream(llm, provider, prompt, inputs, task="transcript")
@@ -48,25 +48,38 @@ def transcribe_audio(
             # Try direct import first (if components are in sys.path)
             from audio_recorder.recorder import AudioRecorder
             from components.sTT_model.whisper_tiny import AudioTranscriptor
+            from components.sTT_model.live import LiveTranscriber
         except ImportError:
             # If that fails, try with components prefix
             from components.audio_recorder.recorder import AudioRecorder
             from components.sTT_model.whisper_tiny import AudioTranscriptor
+            from components.sTT_model.live import LiveTranscriber
         
         # User input handling
         # Audio capture logic
         audio_path = None
+        transcript = None
         
         if recording.lower().strip() == "yes":
             recorder = AudioRecorder()
+            # Transcribe while recording; print the partial transcript as it grows
+            live = LiveTranscriber(
+                on_update=lambda text, tentative: print("\r[live] " + f"{text} {tentative}".strip()[-100:], end="", flush=True)
+            )
             print("Starting recording...")
             recorder.start_recording()
+            follower = live.follow(recorder)
             input("Recording Has Started. Press Enter when you want to stop!!")
             print("Recording Stopped...")
             
             # Save recording in the same directory as this script
             recording_path = script_dir / "recording.mp3"
             audio_path = recorder.stop_recording(str(recording_path))
+
+            start_time = time()
+            follower.join()
+            transcript = live.text
+            print(f"\nTranscript ready {time() - start_time:.1f}s after recording stopped")
             
         elif recording.lower().strip() == "no":
             # Look for recording.mp3 in the same directory as this script
@@ -79,15 +92,16 @@ def transcribe_audio(
         
         # Transcription logic
         if audio_path and os.path.exists(audio_path):
-            transcriptor = AudioTranscriptor()
-            print(f"Processing: {audio_path}")
-            
-            start_time = time()
-            transcript = transcriptor.whisper_transcribe(audio_path)
-            duration = time() - start_time
-            
-            time_str = f"{duration:.1f}s" if duration < 60 else f"{duration//60:.0f}m {duration%60:.0f}s"
-            print(f"Transcription completed in {time_str}")
+            if transcript is None:
+                transcriptor = AudioTranscriptor()
+                print(f"Processing: {audio_path}")
+                
+                start_time = time()
+                transcript = transcriptor.whisper_transcribe(audio_path)
+                duration = time() - start_time
+                
+                time_str = f"{duration:.1f}s" if duration < 60 else f"{duration//60:.0f}m {duration%60:.0f}s"
+                print(f"Transcription completed in {time_str}")
             
             # Save transcript in the same directory as this script
             transcript_path = script_dir / "transcript.txt"
@@ -0,0 +1,230 @@
+"""
+Hardware profile read by the local engines (llama.cpp, Whisper, Kokoro) at load time.
+
+The profile is written by `python -m components.tuning.tune`. Without one,
+conservative defaults derived from the core count are used so the engines
+do not each claim every core.
+"""
+import json
+import os
+import platform
+import threading
+from datetime import datetime, timezone
+
+from ..doc_pipeline.cache import DEFAULT_CACHE_DIR
+
+PROFILE_PATH = os.environ.get(
+    "ADHYAYAN_HW_PROFILE",
+    os.path.join(DEFAULT_CACHE_DIR, "hardware_profile.json")
+)
+
+# Whisper "backend" values: "torch" (FP32), "int8" (dynamic-quantized Linear
+# layers) or "onnx" (exported with optimum, run on ONNX Runtime)
+WHISPER_BACKENDS = ("torch", "int8", "onnx")
+
+_profile = None
+_lock = threading.Lock()
+
+def physical_cores():
+    """
+    Returns:
+        int: Physical core count (logical count halved when psutil is unavailable)
+    """
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+        if cores:
+            return cores
+    except ImportError:
+        pass
+    return max(1, (os.cpu_count() or 2) // 2)
+
+# Relative share of the cores given to each engine. The app runs all three
+# in one process, so their thread counts must add up to the cores available.
+CORE_WEIGHTS = {"llama_cpp": 2, "whisper": 1, "tts": 1}
+
+def allocate_cores(cores=None, weights=None):
+    """
+    Split the cores between engines that run in the same process.
+
+    Args:
+        cores (int, optional): Cores to split. Defaults to the physical cores.
+        weights (dict, optional): engine -> relative share. Defaults to CORE_WEIGHTS.
+
+    Returns:
+        dict: engine -> cores, at least 1 each; the total only exceeds cores
+            when there are fewer cores than engines
+    """
+    cores = cores or physical_cores()
+    weights = weights or CORE_WEIGHTS
+    total = sum(weights.values())
+    allocation = {engine: max(1, cores * weight // total) for engine, weight in weights.items()}
+    # Hand the cores lost to rounding to the engines with the largest share
+    for engine in sorted(weights, key=weights.get, reverse=True):
+        if sum(allocation.values()) >= cores:
+            break
+        allocation[engine] += 1
+    return allocation
+
+def default_profile():
+    """
+    Returns:
+        dict: Untuned settings for this host
+    """
+    allocation = allocate_cores()
+    llama_threads = allocation["llama_cpp"]
+    return {
+        "host": host_info(),
+        "allocation": allocation,
+        "llama_cpp": {"n_threads": llama_threads, "n_threads_batch": llama_threads, "n_batch": 256,
+                      "n_gpu_layers": 0},
+        "whisper": {"torch_threads": allocation["whisper"], "batch_size": 4, "backend": "torch"},
+        "tts": {"torch_threads": allocation["tts"]},
+    }
+
+def cpu_model():
+    """
+    Returns:
+        str: CPU model name ("" if unknown)
+    """
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+def host_info():
+    """
+    Returns:
+        dict: What the profile was measured on
+    """
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "cpu_model": cpu_model(),
+        "logical_cpus": os.cpu_count(),
+        "physical_cores": physical_cores(),
+    }
+
+# The hardware a profile is valid for. The hostname is left out: container
+# hostnames change on every restart while the hardware stays the same.
+HARDWARE_KEYS = ("machine", "cpu_model", "logical_cpus", "physical_cores")
+
+def same_hardware(host):
+    """
+    Args:
+        host (dict): host_info() of a stored profile
+
+    Returns:
+        bool: Whether it was measured on hardware like this host's
+    """
+    current = host_info()
+    return all(host[key] == current[key] for key in HARDWARE_KEYS if key in host)
+
+def load_profile(path=None, reload=False):
+    """
+    Load the hardware profile, falling back to default_profile().
+
+    Sections missing from the file are taken from the defaults. A profile
+    measured on different hardware (CPU model or core count) is ignored.
+
+    Args:
+        path (str, optional): Profile file. Defaults to PROFILE_PATH.
+        reload (bool): Re-read the file instead of using the loaded profile
+
+    Returns:
+        dict: Profile with "llama_cpp", "whisper" and "tts" sections
+    """
+    global _profile
+    with _lock:
+        if _profile is not None and not reload and path is None:
+            return _profile
+
+        profile = default_profile()
+        path = path or PROFILE_PATH
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            if not same_hardware(stored.get("host", {})):
+                host = stored["host"]
+                print(f"Ignoring hardware profile {path}: measured on {host.get('cpu_model') or host.get('node')} "
+                      f"with {host.get('physical_cores')} cores")
+            else:
+                for section in ("llama_cpp", "whisper", "tts"):
+                    profile[section].update(stored.get(section, {}))
+                profile["allocation"] = stored.get("allocation", profile["allocation"])
+                profile["created"] = stored.get("created")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading hardware profile {path}: {e}")
+
+        fit_allocation(profile)
+        if path == PROFILE_PATH:
+            _profile = profile
+        return profile
+
+def fit_allocation(profile):
+    """
+    Cap each engine's threads at its share of the cores (profile["allocation"]),
+    e.g. for a profile tuned before the cores were split or an engine that
+    was not re-tuned.
+
+    Args:
+        profile (dict): Profile, changed in place
+
+    Returns:
+        dict: The profile
+    """
+    allocation = profile["allocation"]
+    for key in ("n_threads", "n_threads_batch"):
+        profile["llama_cpp"][key] = min(profile["llama_cpp"][key], allocation["llama_cpp"])
+    for engine in ("whisper", "tts"):
+        profile[engine]["torch_threads"] = min(profile[engine]["torch_threads"], allocation[engine])
+    return profile
+
+def save_profile(profile, path=None):
+    """
+    Write a hardware profile and make it the loaded one.
+
+    Args:
+        profile (dict): Profile with "llama_cpp", "whisper" and "tts" sections
+        path (str, optional): Profile file. Defaults to PROFILE_PATH.
+
+    Returns:
+        str: Path written
+    """
+    global _profile
+    path = path or PROFILE_PATH
+    profile = {**profile, "host": host_info(), "created": datetime.now(timezone.utc).isoformat()}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    if path == PROFILE_PATH:
+        with _lock:
+            _profile = profile
+    return path
+
+def apply_torch_threads(section):
+    """
+    Set torch's intra-op thread count from a profile section.
+
+    torch threads are process-wide, so Whisper and Kokoro call this before
+    running to get their own tuned value.
+
+    Args:
+        section (str): "whisper" or "tts"
+
+    Returns:
+        int: Threads set
+    """
+    import torch
+    threads = load_profile()[section]["torch_threads"]
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    return threads
@@ -0,0 +1,214 @@
+"""
+Benchmark this host and write the hardware profile read by the local engines.
+
+The app runs llama.cpp, Whisper and Kokoro in one process, so the cores are
+first split between them (profile.allocate_cores) and each engine is tuned
+within its own share; together they never claim more threads than the host
+has. --exclusive tunes every engine over all cores instead, for a process
+that only ever runs one of them.
+
+For llama.cpp, generation speed is measured over thread counts (decoding is
+memory bound and often peaks below the core count), then prompt evaluation
+over batch thread counts and n_batch sizes. Whisper and Kokoro are timed
+over torch intra-op thread counts. The fastest setting of each is written
+to the profile (see profile.py).
+
+Usage:
+    python -m components.tuning.tune --llama-model-path qwen2.5-0.5b-instruct-q8_0.gguf
+    python -m components.tuning.tune --skip-tts --output profile.json
+"""
+import argparse
+import gc
+import json
+import time
+
+from .profile import allocate_cores, fit_allocation, load_profile, physical_cores, save_profile
+
+def thread_candidates(cores):
+    """
+    Returns:
+        list: 1, 2, 4, ... up to cores, plus cores itself and a 3/4 split
+    """
+    candidates = {cores, max(1, cores * 3 // 4)}
+    threads = 1
+    while threads < cores:
+        candidates.add(threads)
+        threads *= 2
+    return sorted(candidates)
+
+def _best(timings):
+    # timings: {setting: seconds}; lower is better
+    return min(timings, key=timings.get)
+
+def tune_llama_cpp(model_path, cores, prompt_tokens=512, gen_tokens=64, batch_sizes=(64, 128, 256, 512)):
+    """
+    Pick llama.cpp threads and batch size
+
+    Args:
+        model_path (str): GGUF used for the measurements
+        cores (int): Cores given to llama.cpp
+        prompt_tokens (int): Prompt length for the prompt evaluation timings
+        gen_tokens (int): Tokens generated for the decoding timings
+        batch_sizes (tuple): n_batch values tried
+
+    Returns:
+        dict: llama_cpp profile section
+    """
+    import llama_cpp
+    from ..doc_pipeline.doc_ex import ex_text
+
+    n_gpu_layers = -1 if llama_cpp.llama_supports_gpu_offload() else 0
+
+    def load(n_threads, n_threads_batch, n_batch):
+        return llama_cpp.Llama(model_path=model_path, n_ctx=2048, n_batch=n_batch, n_threads=n_threads,
+                               n_threads_batch=n_threads_batch, n_gpu_layers=n_gpu_layers, verbose=False)
+
+    def prompt_seconds(model, tokens):
+        model.reset()
+        start = time.perf_counter()
+        model.eval(tokens)
+        return time.perf_counter() - start
+
+    def generate_seconds(model, tokens):
+        model.reset()
+        start = time.perf_counter()
+        # Includes a 32-token prompt, negligible next to the generated tokens
+        for i, _ in enumerate(model.generate(tokens[:32], top_k=1, temp=0.0)):
+            if i + 1 >= gen_tokens:
+                break
+        return time.perf_counter() - start
+
+    model = load(cores, cores, 256)
+    tokens = model.tokenize(ex_text.encode("utf-8"))[:prompt_tokens]
+    del model
+
+    decode, prefill = {}, {}
+    for threads in thread_candidates(cores):
+        model = load(threads, threads, 256)
+        decode[threads] = generate_seconds(model, tokens)
+        prefill[threads] = prompt_seconds(model, tokens)
+        print(f"llama.cpp threads={threads}: {gen_tokens / decode[threads]:.1f} tok/s generation, "
+              f"{len(tokens) / prefill[threads]:.1f} tok/s prompt")
+        del model
+        gc.collect()
+    n_threads, n_threads_batch = _best(decode), _best(prefill)
+
+    batches = {}
+    for n_batch in batch_sizes:
+        model = load(n_threads, n_threads_batch, n_batch)
+        batches[n_batch] = prompt_seconds(model, tokens)
+        print(f"llama.cpp n_batch={n_batch}: {len(tokens) / batches[n_batch]:.1f} tok/s prompt")
+        del model
+        gc.collect()
+
+    return {"n_threads": n_threads, "n_threads_batch": n_threads_batch,
+            "n_batch": _best(batches), "n_gpu_layers": n_gpu_layers}
+
+def _time_torch(run, cores, label, repeats=2):
+    import torch
+
+    timings = {}
+    for threads in thread_candidates(cores):
+        torch.set_num_threads(threads)
+        run()  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            run()
+        timings[threads] = (time.perf_counter() - start) / repeats
+        print(f"{label} torch threads={threads}: {timings[threads]:.2f}s")
+    return timings
+
+def tune_whisper(cores, model_name="openai/whisper-tiny", batch_sizes=(1, 2, 4, 8)):
+    """
+    Pick torch threads and batch size for Whisper
+
+    Args:
+        cores (int): Cores given to Whisper
+        model_name (str): Whisper checkpoint
+        batch_sizes (tuple): Batch sizes tried, in 30 s windows
+
+    Returns:
+        dict: whisper profile section
+    """
+    import numpy as np
+    import torch
+    from transformers import WhisperProcessor, WhisperForConditionalGeneration
+
+    processor = WhisperProcessor.from_pretrained(model_name)
+    model = WhisperForConditionalGeneration.from_pretrained(model_name)
+    # 30 s of a quiet tone: the encoder cost does not depend on the content
+    tone = (0.01 * np.sin(2 * np.pi * 220 * np.arange(30 * 16000) / 16000)).astype(np.float32)
+
+    def run(batch_size=1):
+        features = processor([tone] * batch_size, sampling_rate=16000, return_tensors="pt").input_features
+        with torch.inference_mode():
+            model.generate(features, max_new_tokens=32)
+
+    threads = _best(_time_torch(run, cores, "whisper"))
+    torch.set_num_threads(threads)
+
+    per_window = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        run(batch_size)
+        per_window[batch_size] = (time.perf_counter() - start) / batch_size
+        print(f"whisper batch_size={batch_size}: {per_window[batch_size]:.2f}s per 30 s window")
+    return {"torch_threads": threads, "batch_size": _best(per_window)}
+
+def tune_tts(cores, text="Kokoro is an open-weight text to speech model with eighty two million parameters."):
+    """
+    Pick torch threads for Kokoro
+
+    Args:
+        cores (int): Cores given to Kokoro
+        text (str): Sentence synthesized for the timings
+
+    Returns:
+        dict: tts profile section
+    """
+    from kokoro import KPipeline
+
+    pipeline = KPipeline(lang_code="a", repo_id="hexgrad/Kokoro-82M")
+
+    def run():
+        for _ in pipeline(text, voice="af_heart"):
+            pass
+
+    return {"torch_threads": _best(_time_torch(run, cores, "kokoro"))}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune local inference settings for this host")
+    parser.add_argument("--llama-model-path", default=None, help="GGUF to tune llama.cpp with (skipped if omitted)")
+    parser.add_argument("--whisper-model", default="openai/whisper-tiny")
+    parser.add_argument("--skip-whisper", action="store_true")
+    parser.add_argument("--skip-tts", action="store_true")
+    parser.add_argument("--cores", type=int, default=None, help="Cores to tune for (default: physical cores)")
+    parser.add_argument("--exclusive", action="store_true",
+                        help="Tune each engine over all cores instead of its share")
+    parser.add_argument("--output", default=None, help="Profile path (default: the cache directory)")
+    args = parser.parse_args(argv)
+
+    cores = args.cores or physical_cores()
+    # Engines that are not re-tuned keep their current settings
+    profile = load_profile(args.output, reload=True)
+    if args.exclusive:
+        allocation = {engine: cores for engine in ("llama_cpp", "whisper", "tts")}
+    else:
+        allocation = allocate_cores(cores)
+    profile["allocation"] = allocation
+    print(f"Tuning for {cores} cores: " + ", ".join(f"{engine} {n}" for engine, n in allocation.items()))
+
+    # Measured settings replace the old ones; others (e.g. the Whisper backend) are kept
+    if args.llama_model_path:
+        profile["llama_cpp"].update(tune_llama_cpp(args.llama_model_path, allocation["llama_cpp"]))
+    if not args.skip_whisper:
+        profile["whisper"].update(tune_whisper(allocation["whisper"], args.whisper_model))
+    if not args.skip_tts:
+        profile["tts"].update(tune_tts(allocation["tts"]))
+
+    path = save_profile(fit_allocation(profile), args.output)
+    print(json.dumps({key: profile[key] for key in ("allocation", "llama_cpp", "whisper", "tts")}, indent=2))
+    print(f"Profile written to {path}")
+
+if __name__ == "__main__":
+    main()
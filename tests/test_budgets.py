@@ -0,0 +1,46 @@
+from components.select_llm.budgets import TokenBudgets
+
+def make_budgets(tmp_path, **options):
+    return TokenBudgets(path=str(tmp_path / "budgets.sqlite"), min_samples=20, **options)
+
+def test_default_budget_until_min_samples(tmp_path):
+    budgets = make_budgets(tmp_path)
+    for _ in range(19):
+        budgets.record("question_gen", 300, budget=768)
+    assert budgets.budget("question_gen") == 768
+
+def test_calibrates_to_percentile_with_headroom(tmp_path):
+    budgets = make_budgets(tmp_path)
+    for _ in range(20):
+        budgets.record("question_gen", 400, budget=768)
+    assert budgets.budget("question_gen") == 500
+
+def test_single_truncation_grows_budget_one_step(tmp_path):
+    budgets = make_budgets(tmp_path)
+    for _ in range(20):
+        budgets.record("question_gen", 400, budget=768)
+    budget = budgets.budget("question_gen")
+
+    budgets.record("question_gen", budget, budget=budget)
+
+    assert budgets.budget("question_gen") == int(budget * 1.25)
+    assert budgets.budget("question_gen") < budgets.ceiling
+
+def test_repeated_truncation_is_capped_at_ceiling(tmp_path):
+    budgets = make_budgets(tmp_path, ceiling=1024)
+    for _ in range(20):
+        budgets.record("judge", 400, budget=3072)
+    for _ in range(20):
+        budget = budgets.budget("judge")
+        budgets.record("judge", budget, budget=budget)
+    assert budgets.budget("judge") == 1024
+
+def test_output_tokens_use_provider_counts():
+    from types import SimpleNamespace
+    from components.select_llm import client
+
+    response = SimpleNamespace(content="Bonjour", usage_metadata={"output_tokens": 7})
+    assert client._output_tokens(None, "google_genai", "Bonjour", client._usage_tokens(response)) == 7
+    # No usage and no matching tokenizer: not recorded rather than counted in Qwen tokens
+    assert client._output_tokens(None, "build_nvidia", "Bonjour", client._usage_tokens("Bonjour")) is None
+    assert client._output_tokens(SimpleNamespace(model="llama3.2"), "ollama", "Bonjour") is None
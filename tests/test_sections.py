@@ -0,0 +1,24 @@
+from components.doc_pipeline.sections import split_sections
+
+def count_tokens(text):
+    return len(text.split())
+
+def make_notes(topics=40, words=60):
+    return "\n\n".join(
+        f"## Topic {topic}\n\n" + " ".join(f"word{topic}_{index}" for index in range(words))
+        for topic in range(topics)
+    )
+
+def test_sections_stay_within_budget():
+    sections = split_sections(make_notes(), count_tokens, max_tokens=300)
+    assert len(sections) > 1
+    assert all(count_tokens(section) <= 300 for section in sections)
+
+def test_edit_only_changes_nearby_sections():
+    notes = make_notes()
+    before = split_sections(notes, count_tokens, max_tokens=300)
+    after = split_sections(notes.replace("word3_10", "word3_10 typo", 1), count_tokens, max_tokens=300)
+
+    changed = [section for section in after if section not in before]
+    assert len(changed) <= 2
+    assert len(after) - len(changed) >= len(before) - 2
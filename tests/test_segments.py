@@ -0,0 +1,59 @@
+from components.sTT_model.segments import stitch_segments
+
+# Two 30 s windows overlapping by 5 s, as transcribe_segments lays them out
+def make_windows(first, second):
+    return [
+        {"start_s": 0.0, "length_s": 30.0, "keep_from": 0.0, "keep_to": 27.5,
+         "next_start_s": 25.0, "segments": first},
+        {"start_s": 25.0, "length_s": 20.0, "keep_from": 27.5, "keep_to": float("inf"),
+         "next_start_s": None, "segments": second},
+    ]
+
+def segment(text, start, end):
+    return {"text": text, "timestamp": (start, end)}
+
+def transcript(segments):
+    return " ".join(item["text"] for item in segments)
+
+def test_open_ended_segment_before_next_window_is_not_duplicated():
+    windows = make_windows(
+        [segment(" We ran the tests.", 20.0, 24.5),
+         segment(" The results were clear and then we moved on to", 24.5, None)],
+        [segment(" results were clear", 0.0, 1.5),
+         segment(" and then we moved on", 1.5, 4.0),
+         segment(" to the next chapter.", 4.0, 7.0)],
+    )
+    segments = stitch_segments(windows, duration=45.0)
+    assert transcript(segments) == (
+        "We ran the tests. The results were clear and then we moved on to the next chapter.")
+    assert segments[1]["end"] == 30.0
+    assert segments[2]["start"] == 30.0
+
+def test_open_ended_segment_inside_next_window_is_decoded_there():
+    windows = make_windows(
+        [segment(" We ran the tests.", 20.0, 26.0),
+         segment(" And then", 26.0, None)],
+        [segment(" the tests.", 0.0, 1.0),
+         segment(" And then we moved on.", 1.0, 3.0),
+         segment(" Next chapter.", 3.0, 6.0)],
+    )
+    segments = stitch_segments(windows, duration=45.0)
+    assert transcript(segments) == "We ran the tests. And then we moved on. Next chapter."
+    assert segments[1]["start"] == 26.0
+
+def test_segments_split_at_the_middle_of_the_overlap():
+    windows = make_windows(
+        [segment(" One.", 20.0, 26.0),
+         segment(" Two.", 26.0, 28.0),
+         segment(" Three.", 28.0, 29.9)],
+        [segment(" One.", 0.0, 1.0),
+         segment(" Two.", 1.0, 3.0),
+         segment(" Three.", 3.0, 5.0)],
+    )
+    assert transcript(stitch_segments(windows, duration=45.0)) == "One. Two. Three."
+
+def test_last_window_keeps_segment_without_end():
+    windows = make_windows([segment(" Hello.", 0.0, 5.0)], [segment(" Goodbye", 2.0, None)])
+    segments = stitch_segments(windows, duration=40.0)
+    assert transcript(segments) == "Hello. Goodbye"
+    assert segments[-1]["end"] == 40.0
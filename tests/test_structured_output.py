@@ -0,0 +1,41 @@
+import pytest
+
+from components.select_llm.client import parse_json
+
+FENCED_PAIRS = '''```json
+{
+    "pairs": [
+        {"question": "What was the Estates-General?", "answer": "An assembly of the three estates."},
+        {"question": "Explain \\"the Terror\\".", "answer": "The period of mass executions in 1793-94."}
+    ]
+}
+```'''
+
+def test_parse_json_strips_code_fence():
+    data = parse_json(FENCED_PAIRS)
+    assert [pair["question"] for pair in data["pairs"]] == [
+        "What was the Estates-General?", 'Explain "the Terror".']
+
+def test_parse_json_ignores_surrounding_text():
+    assert parse_json('Here are the questions: {"questions": ["Why?"]} Hope this helps.') == {"questions": ["Why?"]}
+
+def test_parse_json_rejects_text_without_json():
+    with pytest.raises(ValueError):
+        parse_json("I cannot answer that.")
+
+def test_supplementary_qa_accepts_fence_and_list_of_pairs():
+    pytest.importorskip("langchain")
+    from components.revision_tools.ex_questions import parse_supplementary_qa
+
+    assert len(parse_supplementary_qa(FENCED_PAIRS)) == 2
+    pairs = parse_supplementary_qa('[{"question": "Why 1789?", "answer": "Debt and famine."}]')
+    assert pairs == [{"question": "Why 1789?", "answer": "Debt and famine."}]
+
+def test_questions_keep_escaped_quotes():
+    pytest.importorskip("langchain")
+    from components.question_generator.questions import parse_questions, extract_python_list
+
+    fenced = '```json\n{"questions": ["Explain \\"liberty\\".", "Why did the monarchy fall?"]}\n```'
+    assert parse_questions(fenced) == ['Explain "liberty".', "Why did the monarchy fall?"]
+    assert extract_python_list('Questions: ["Explain \\"liberty\\".", "Compare [the estates]."]') == [
+        'Explain "liberty".', "Compare [the estates]."]
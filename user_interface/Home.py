@@ -4,13 +4,19 @@ import os
 import librosa
 from datetime import timedelta
 import tempfile
+import time
+import uuid
 from audio_recorder_streamlit import audio_recorder
 
 # Add the parent directory to the path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from components.sTT_model.whisper_tiny import AudioTranscriptor
-from components.select_llm import google_genai, ollama, llama_cpp, build_nvidia
+from components.sTT_model.shared import get_transcriber
+from components.sTT_model.live import transcribe_progressively, LiveTranscriber
+from components.tuning.profile import load_profile, WHISPER_BACKENDS as STT_BACKENDS
+from components.select_llm import client, registry, budgets, llama_cpp
 from components.doc_pipeline.pipeline import DocumentProcessor
+from components.doc_pipeline.cache import get_default_cache
+from components.doc_pipeline.retrieval import DocumentIndex, DEFAULT_CONTEXT_BUDGET
 
 # --- Session State Initialization ---
 if 'unlocked_pages' not in st.session_state:
@@ -23,16 +29,54 @@ if 'unlocked_pages' not in st.session_state:
 
 session_vars = [
     'file_path', 'duration', 'llm', 'model', 
-    'provider', 'doc_result', 'trans_result'
+    'provider', 'doc_result', 'trans_result', 'doc_index', 'trans_segments',
+    'llm_unloaded', 'live_recording'
 ]
 for var in session_vars:
     if var not in st.session_state:
         st.session_state[var] = None
+if 'session_id' not in st.session_state:
+    # Registry clients are shared by all sessions; this id marks the ones this session holds
+    st.session_state.session_id = uuid.uuid4().hex
 
 def valid_audio_file(file_path):
     """Validate audio file existence and content"""
     return file_path and os.path.exists(file_path) and librosa.get_duration(path=file_path) > 0
 
+def select_llm(provider, **params):
+    """
+    Make the chosen model the session's LLM.
+
+    The registry returns an already loaded client, so this is cheap on
+    reruns. When the selection changes, the session's hold on the previous
+    client is released; it is unloaded only if no other session uses it.
+    A model the user unloaded is not loaded again until they pick another
+    model or press Load.
+
+    Args:
+        provider (str): Registry provider name
+        **params: Arguments for the provider's set_llm
+
+    Returns:
+        bool: Whether a model is selected
+    """
+    selection = registry.instance_key(provider, **params)
+    if st.session_state.llm_unloaded == selection:
+        if not st.button("▶️ Load model", help="Load the model again"):
+            return False
+        st.session_state.llm_unloaded = None
+    previous = st.session_state.get('llm_selection')
+    if previous is not None and previous != selection:
+        registry.release(st.session_state.session_id, key=previous)
+    llm_config = registry.get_llm(provider, holder=st.session_state.session_id, **params)
+    st.session_state.update({
+        'llm': llm_config[0],
+        'model': llm_config[1],
+        'provider': llm_config[2],
+        'llm_selection': selection,
+    })
+    return True
+
 st.set_page_config(page_title="Adhyayan Mitra", page_icon="🎓", layout="wide")
 
 # --- Main Header ---
@@ -80,7 +124,7 @@ with st.container():
     
     audio_mode = st.radio(
         "Choose how you'd like to provide audio:",
-        ("Record with microphone","Upload an audio file"),
+        ("Record with microphone", "Record with live transcript", "Upload an audio file"),
         horizontal=True,
         help="Record directly or upload an existing audio file (WAV/MP3/M4A/OGG)."
     )
@@ -110,6 +154,51 @@ with st.container():
             if valid_audio_file(st.session_state.file_path):
                 st.audio(st.session_state.file_path)
                 st.caption(f"⏱️ Audio duration: {st.session_state.duration:.2f} seconds")
+    elif audio_mode == "Record with live transcript":
+        st.caption("Records from the microphone of the computer running the app and transcribes while you speak; "
+                   "the transcript is ready a few seconds after you stop.")
+        live_recording = st.session_state.live_recording
+        if live_recording is None:
+            if st.button("⏺️ Start recording", key="live_start"):
+                try:
+                    from components.audio_recorder.recorder import AudioRecorder
+                    recorder = AudioRecorder()
+                    live = LiveTranscriber()
+                    recorder.start_recording()
+                except (ImportError, OSError) as e:
+                    st.error(f"❌ Microphone unavailable: {str(e)}")
+                else:
+                    st.session_state.live_recording = {
+                        'recorder': recorder, 'live': live, 'follower': live.follow(recorder)
+                    }
+                    st.rerun()
+        else:
+            recorder, live = live_recording['recorder'], live_recording['live']
+            live_output = st.empty()
+            if st.button("⏹️ Stop recording", key="live_stop"):
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
+                    recording_path = tmp_file.name
+                audio_path = recorder.stop_recording(recording_path)
+                with st.spinner("📝 Finishing transcript..."):
+                    live_recording['follower'].join()
+                st.session_state.live_recording = None
+                if audio_path and valid_audio_file(audio_path):
+                    st.session_state.update({
+                        'file_path': audio_path,
+                        'duration': librosa.get_duration(path=audio_path),
+                        'trans_result': live.text,
+                        'trans_segments': None,
+                    })
+                    st.toast(f"✅ Recording transcribed ({timedelta(seconds=int(st.session_state.duration))})")
+                else:
+                    st.error("⚠️ Nothing was recorded. Please Retry.")
+            else:
+                # Redrawn until Stop is clicked, which reruns the script and ends this loop
+                while recorder.recording:
+                    live_output.markdown(f"{live.text} *{live.tentative}* ▌")
+                    time.sleep(0.5)
+        if valid_audio_file(st.session_state.file_path) and st.session_state.live_recording is None:
+            st.audio(st.session_state.file_path)
     else:  # Upload an audio file
         st.caption("Upload a recording of yourself explaining the French Revolution")
         uploaded_audio = st.file_uploader(
@@ -144,6 +233,18 @@ with st.container():
     **Purpose:** This text version allows the AI to evaluate your understanding of key historical events and concepts.
     """)
     trans_col1, trans_col2 = st.columns([3,1])
+    with trans_col2:
+        stt_backend = st.selectbox(
+            "🎛️ Speech-to-text backend",
+            STT_BACKENDS,
+            index=STT_BACKENDS.index(load_profile()["whisper"]["backend"]),
+            help="INT8 and ONNX Runtime are faster on CPU; benchmark them with python -m components.sTT_model.benchmark"
+        )
+        with_timestamps = st.toggle(
+            "🕒 Timestamps",
+            value=False,
+            help="Record when each sentence was said, decoded in one pass over overlapping windows"
+        )
     with trans_col1:
         if st.button("✨ Generate Transcript", 
                     disabled=not valid_audio_file(st.session_state.file_path),
@@ -152,11 +253,23 @@ with st.container():
                 st.warning(f"⚠️ Minimum 30 seconds required (Current: {st.session_state.duration:.2f}s)")
             else:
                 try:
+                    live_output = st.empty()
                     with st.spinner("🔍 Analyzing content..."):
-                        transcriptor = AudioTranscriptor()
-                        st.session_state.trans_result = transcriptor.whisper_transcribe(
-                            st.session_state.file_path
-                        )
+                        audio, _ = librosa.load(st.session_state.file_path, sr=16000)
+                        # Shared across sessions and reruns; loaded once, unloaded when idle.
+                        transcriber = get_transcriber(backend=stt_backend)
+                        if with_timestamps:
+                            segments = transcriber.transcribe_segments(audio)
+                            st.session_state.trans_segments = segments
+                            st.session_state.trans_result = " ".join(segment["text"] for segment in segments)
+                        else:
+                            # Partial text is shown as each batch of windows is decoded
+                            transcript = ""
+                            for transcript in transcribe_progressively(audio, transcriber=transcriber):
+                                live_output.markdown(f"{transcript} ▌")
+                            live_output.empty()
+                            st.session_state.trans_segments = None
+                            st.session_state.trans_result = transcript
                     st.toast("Transcript generated!", icon="✅")
                 except Exception as e:
                     st.error(f"❌ Transcription failed: {str(e)}")
@@ -164,6 +277,12 @@ with st.container():
         # Editable transcript area and update button
         if st.session_state.trans_result:
             st.subheader("📄 Learning Session Transcript")
+            if st.session_state.trans_segments:
+                with st.expander("🕒 Timestamped segments"):
+                    st.text("\n".join(
+                        f"[{timedelta(seconds=int(segment['start']))} - {timedelta(seconds=int(segment['end']))}] {segment['text']}"
+                        for segment in st.session_state.trans_segments
+                    ))
             edited_transcript = st.text_area(
                 "Edit Transcript:",
                 value=st.session_state.trans_result,
@@ -217,13 +336,8 @@ with st.container():
             google_api = st.text_input("🔑 Google API Key", type="password", help="Get your API key from https://aistudio.google.com")
             if google_api:
                 try:
-                    llm_config = google_genai.set_llm(model=model, google_api=google_api)
-                    st.session_state.update({
-                        'llm': llm_config[0],
-                        'model': llm_config[1],
-                        'provider': llm_config[2],
-                    })
-                    st.success("✅ Google GenAI authenticated successfully")
+                    if select_llm("google_genai", model=model, google_api=google_api):
+                        st.success("✅ Google GenAI authenticated successfully")
                 except Exception as e:
                     st.error(f"❌ Authentication failed: {str(e)}")
         elif provider == "Build With NVIDIA":
@@ -244,37 +358,61 @@ with st.container():
                                         help="API key starts with 'nvapi-'")
             if nvidia_api_key:
                 try:
-                    llm_config = build_nvidia.set_llm(
-                        model=model, 
-                        nvidia_api_key=nvidia_api_key
-                    )
-                    st.session_state.update({
-                        'llm': llm_config[0],
-                        'model': llm_config[1],
-                        'provider': llm_config[2],
-                    })
-                    st.success("✅ NVIDIA AI authenticated successfully")
+                    if select_llm("build_nvidia", model=model, nvidia_api_key=nvidia_api_key):
+                        st.success("✅ NVIDIA AI authenticated successfully")
                 except Exception as e:
                     st.error(f"❌ Authentication failed: {str(e)}")
         elif provider == "Ollama":
-            llm_config = ollama.set_llm()
-            st.session_state.update({
-                'llm': llm_config[0],
-                'model': llm_config[1],
-                'provider': llm_config[2]
-            })
+            select_llm("ollama")
         else:
-            llm_config = llama_cpp.set_llm()
-            st.session_state.update({
-                'llm': llm_config[0],
-                'model': llm_config[1],
-                'provider': llm_config[2]
-            })
+            speculative = st.toggle(
+                "⚡ Prompt-lookup decoding",
+                value=False,
+                help="Speculative decoding that drafts tokens from the prompt. Speeds up outputs that copy the study material; results are unchanged."
+            )
+            llama_params = {"speculative": "prompt_lookup"} if speculative else {}
+            select_llm("llama_cpp", **llama_params)
     with model_col2:
         st.subheader("🔧 Active Configuration")
         st.metric("Selected Provider", provider)
         st.metric("Active Model", st.session_state.model)
         st.caption("Model parameters and settings")
+        if st.toggle("💾 Cache LLM responses",
+                     value=client.get_response_cache() is not None,
+                     help="Reuse earlier answers for identical prompts. Only deterministic (temperature 0) calls are cached."):
+            response_cache = client.enable_response_cache()
+            response_stats = response_cache.stats()
+            st.caption(f"Response cache: {response_stats['hits']} hits / {response_stats['misses']} misses "
+                       f"({response_stats['entries']} stored)")
+        else:
+            client.disable_response_cache()
+        with st.expander("📏 Output token budgets"):
+            st.caption("Per-stage output limits, calibrated from the lengths of earlier outputs.")
+            st.table([
+                {"Stage": task, **values}
+                for task, values in budgets.get_budgets().stats().items()
+            ])
+        if provider == "Llama-CPP" and st.session_state.llm is not None:
+            tiers = llama_cpp.context_tiers(st.session_state.llm)
+            if tiers is not None and tiers.last_request:
+                last = tiers.last_request
+                st.caption(f"Last request: {last['prompt_tokens']} + {last['max_tokens']} tokens on the "
+                           f"{last['n_ctx']} context tier, KV cache {last['kv_allocated_mb']} MB "
+                           f"({last['kv_loaded_mb']} MB across loaded tiers)")
+        if provider in ("Ollama", "Llama-CPP"):
+            if st.button("⏏️ Unload local models", help="Free the memory held by loaded local models"):
+                unloaded, shared = registry.release(st.session_state.session_id,
+                                                    providers=("llama_cpp", "ollama"))
+                st.session_state.update({
+                    'llm': None, 'model': None, 'provider': None,
+                    # Not reloaded on the next rerun; only when a model is picked again
+                    'llm_unloaded': st.session_state.get('llm_selection'),
+                    'llm_selection': None,
+                })
+                message = f"Unloaded {unloaded} local model(s)"
+                if shared:
+                    message += f"; {shared} still in use by other sessions"
+                st.toast(message, icon="⏏️")
 
 # --- Document Processing ---
 with st.container():
@@ -286,30 +424,73 @@ with st.container():
     """)
     doc_col1, doc_col2 = st.columns([2,1])
     with doc_col1:
-        uploaded_file = st.file_uploader("Upload French Revolution study materials (PDF/DOCX/MD)", 
+        uploaded_files = st.file_uploader("Upload French Revolution study materials (PDF/DOCX/MD)", 
                                        type=['pdf', 'docx', 'md'],
-                                       help="Enhance analysis with course materials")
-        if uploaded_file:
-            temp_path = None
+                                       accept_multiple_files=True,
+                                       help="Upload one or more files, e.g. a textbook chapter, class notes and a worksheet")
+        if uploaded_files:
+            temp_paths = []
             try:
-                with st.spinner("📖 Processing documents..."):
-                    file_extension = os.path.splitext(uploaded_file.name)[1]
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-                        tmp_file.write(uploaded_file.getvalue())
-                        temp_path = tmp_file.name
+                with st.status("📖 Processing documents...", expanded=True) as status:
+                    for uploaded_file in uploaded_files:
+                        file_extension = os.path.splitext(uploaded_file.name)[1]
+                        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
+                            tmp_file.write(uploaded_file.getvalue())
+                            temp_paths.append(tmp_file.name)
                     processor = DocumentProcessor(
                         llm=st.session_state.llm,
                         provider=st.session_state.provider,
                     )
-                    st.session_state.doc_result = processor.process_document(
-                        file_path=temp_path
-                    )
+                    if len(temp_paths) == 1:
+                        # Render each converted page window as soon as it is ready
+                        for event in processor.stream_document(file_path=temp_paths[0]):
+                            if event["type"] == "window":
+                                status.update(
+                                    label=f"📖 Converted pages {event['end_page']} of {event['page_count']}..."
+                                )
+                                with st.expander(f"Pages {event['start_page']}-{event['end_page']}"):
+                                    st.markdown(event["markdown"])
+                            else:
+                                st.session_state.doc_result = event["text"]
+                    else:
+                        status.update(label=f"📖 Converting {len(temp_paths)} documents...")
+                        st.session_state.doc_result = processor.process_documents(
+                            file_paths=temp_paths,
+                            names=[uploaded_file.name for uploaded_file in uploaded_files]
+                        )
+                        for failed_path, error in processor.conversion_errors.items():
+                            name = uploaded_files[temp_paths.index(failed_path)].name if failed_path in temp_paths else failed_path
+                            st.warning(f"⚠️ Could not convert {name}: {error}")
+                        if processor.duplicates_removed:
+                            st.caption(f"🔁 Removed {processor.duplicates_removed} paragraphs repeated across files")
+                    # Built once per document; each stage retrieves from it
+                    st.session_state.doc_index = DocumentIndex(st.session_state.doc_result)
+                    if processor.clean_stats:
+                        st.caption(f"🧹 Cleaning removed {processor.clean_stats['tokens_saved']} tokens "
+                                   f"of {processor.clean_stats['tokens_before']}")
+                    if processor.section_stats['reused']:
+                        st.caption(f"♻️ Reused {processor.section_stats['reused']} unchanged section summaries, "
+                                   f"summarized {processor.section_stats['summarized']}")
+                    status.update(label="📖 Documents processed", state="complete", expanded=False)
                 st.success("✅ French Revolution materials processed successfully")
             except Exception as e:
                 st.error(f"❌ Processing failed: {str(e)}")
             finally:
-                if temp_path and os.path.exists(temp_path):
-                    os.unlink(temp_path)
+                for temp_path in temp_paths:
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+    with doc_col2:
+        cache_stats = get_default_cache().stats()
+        st.metric("Cached Documents", cache_stats['entries'])
+        st.caption(f"Conversion cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        st.session_state.context_budget = st.number_input(
+            "📏 Context budget (tokens)",
+            min_value=500,
+            max_value=16000,
+            value=st.session_state.get('context_budget') or DEFAULT_CONTEXT_BUDGET,
+            step=250,
+            help="Maximum tokens of study material sent with each prompt. Only the most relevant sections are included."
+        )
 
     # Key Insights section immediately below header
     if st.session_state.doc_result:
@@ -14,19 +14,25 @@ def gap_analysis():
     # Only compute analysis if not already done or if user requests regeneration
     regenerate = st.button("🔄 Regenerate GAP Analysis")
     if 'gap_analysis' not in st.session_state or st.session_state.gap_analysis is None or regenerate:
-        with st.spinner("Analyzing learning gaps..."):
-            try:
-                analysis = analyzer.learning_gap(
+        try:
+            # Show the analysis token by token while it is being generated
+            live_output = st.empty()
+            with live_output.container():
+                st.caption("Analyzing learning gaps...")
+                analysis = st.write_stream(analyzer.learning_gap_stream(
                     llm=st.session_state.llm,
                     provider=st.session_state.provider,
                     doc_result=st.session_state.doc_result,
-                    trans_result=st.session_state.trans_result
-                )
-                st.session_state.gap_analysis = analysis
-                st.success("GAP Analysis completed!")
-            except Exception as e:
-                st.error(f"Gap analysis failed: {str(e)}")
-                st.stop()
+                    trans_result=st.session_state.trans_result,
+                    doc_index=st.session_state.get('doc_index'),
+                    token_budget=st.session_state.get('context_budget')
+                ))
+            live_output.empty()
+            st.session_state.gap_analysis = analysis
+            st.success("GAP Analysis completed!")
+        except Exception as e:
+            st.error(f"Gap analysis failed: {str(e)}")
+            st.stop()
 
     # Display formatted analysis
     st.subheader("🔍 Identified Learning Gaps")
@@ -27,7 +27,9 @@ def qa_page():
                         provider=st.session_state.provider,
                         doc_result=st.session_state.doc_result,
                         trans_result=st.session_state.trans_result,
-                        analysis=st.session_state.gap_analysis
+                        analysis=st.session_state.gap_analysis,
+                        doc_index=st.session_state.get('doc_index'),
+                        token_budget=st.session_state.get('context_budget')
                     )
                     if generated_questions:
                         st.session_state.questions = generated_questions
@@ -23,23 +23,29 @@ def final_analysis():
 
     if st.button("🔄 Generate Comprehensive Evaluation"):
         try:
-            with st.spinner("Conducting in-depth analysis..."):
-                evaluation = judge.qna_check_and_scoring(
+            # Show the report token by token while it is being generated
+            live_output = st.empty()
+            with live_output.container():
+                st.caption("Conducting in-depth analysis...")
+                evaluation = st.write_stream(judge.qna_check_and_scoring_stream(
                     llm=st.session_state.llm,
                     provider=st.session_state.provider,
                     doc_result=st.session_state.doc_result,
                     trans_result=st.session_state.trans_result,
                     analysis=st.session_state.gap_analysis,
-                    qna=qna_content
-                )
-                
-                st.session_state.evaluation_report = evaluation
-                
-                st.success("Evaluation completed!")
-                
-                # Unlock next section
-                st.session_state.unlocked_pages['Learning_Material'] = True
-                st.toast("✅ Learning Materials unlocked!", icon="📚")
+                    qna=qna_content,
+                    doc_index=st.session_state.get('doc_index'),
+                    token_budget=st.session_state.get('context_budget')
+                ))
+            live_output.empty()
+            
+            st.session_state.evaluation_report = evaluation
+            
+            st.success("Evaluation completed!")
+            
+            # Unlock next section
+            st.session_state.unlocked_pages['Learning_Material'] = True
+            st.toast("✅ Learning Materials unlocked!", icon="📚")
 
         except Exception as e:
             st.error(f"Evaluation failed: {str(e)}")
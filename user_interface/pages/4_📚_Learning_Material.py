@@ -5,6 +5,23 @@ from components.audio_gen import kokoro_tts
 from components.revision_tools import summary
 from components.revision_tools import key_vocab
 from components.revision_tools import ex_questions
+from components.revision_tools import learning_material as materials
+
+def stream_output(caption, chunks):
+    """Render streamed LLM output while it is generated and return the full text."""
+    live_output = st.empty()
+    with live_output.container():
+        st.caption(caption)
+        text = st.write_stream(chunks)
+    live_output.empty()
+    return text
+
+ARTIFACT_LABELS = {
+    "learning_transcript": "🔊 Audio explainer transcript",
+    "summary_notes": "📄 Summary notes",
+    "qs_pairs": "❓ Supplementary questions",
+    "vocab": "📚 Key vocabulary",
+}
 
 def learning_material():
     # Check prerequisites
@@ -35,6 +52,38 @@ def learning_material():
         """
     )
 
+    # --- Generate All ---
+    if st.button("⚡ Generate All Learning Material", key="generate_all_btn", use_container_width=True):
+        with st.status("Generating learning material...", expanded=True) as status:
+            failed = 0
+            for name, result, error in materials.generate_all(
+                llm=st.session_state.llm,
+                provider=st.session_state.provider,
+                evaluation_report=st.session_state.evaluation_report,
+                qna=st.session_state.qa_pairs,
+                analysis=st.session_state.gap_analysis,
+                doc_result=st.session_state.doc_result,
+                trans_result=st.session_state.trans_result,
+                doc_index=st.session_state.get('doc_index'),
+                token_budget=st.session_state.get('context_budget')
+            ):
+                if error is not None:
+                    failed += 1
+                    st.write(f"❌ {ARTIFACT_LABELS[name]} failed: {error}")
+                    continue
+                st.session_state[name] = result
+                with st.expander(f"✅ {ARTIFACT_LABELS[name]}", expanded=False):
+                    if name == "qs_pairs":
+                        for i, pair in enumerate(result):
+                            st.markdown(f"**Q{i+1}: {pair['question']}**")
+                    else:
+                        st.markdown(result)
+            status.update(
+                label="Learning material generated" if not failed else f"{failed} item(s) failed",
+                state="complete" if not failed else "error",
+                expanded=bool(failed)
+            )
+
     # --- Audio Explainer Section ---
     st.subheader("🔊 Audio Explainer")
     if 'tts' not in st.session_state:
@@ -58,20 +107,21 @@ def learning_material():
         )[1]
     if st.button("Generate Audio Explanation", key="audio_explainer_btn"):
         if 'learning_transcript' not in st.session_state:
-            with st.spinner("Generating transcript for audio explainer..."):
-                qna_content = "\n".join(
-                    [f"Q{i+1}. {pair['question']}\nAns: {pair['answer']}\n" 
-                    for i, pair in enumerate(st.session_state.qa_pairs)]
-                )
-                st.session_state.learning_transcript = transcript.get_transcript(
+            qna_content = materials.format_qna_for_transcript(st.session_state.qa_pairs)
+            st.session_state.learning_transcript = transcript.clean_transcript(stream_output(
+                "Generating transcript for audio explainer...",
+                transcript.get_transcript_stream(
                     llm=st.session_state.llm,
                     provider=st.session_state.provider,
                     evaluation_report=st.session_state.evaluation_report,
                     qna=qna_content,
                     analysis=st.session_state.gap_analysis,
                     doc_result=st.session_state.doc_result,
-                    trans_result=st.session_state.trans_result
+                    trans_result=st.session_state.trans_result,
+                    doc_index=st.session_state.get('doc_index'),
+                    token_budget=st.session_state.get('context_budget')
                 )
+            ))
         try:
             with st.spinner("Synthesizing audio content..."):
                 audio_path = st.session_state.tts.generate_audio(
@@ -98,16 +148,20 @@ def learning_material():
     # --- Summary Notes Section ---
     st.subheader("📄 Summary Notes")
     if st.button("Generate Summary Notes", key="summary_btn"):
-        with st.spinner("Generating summary notes..."):
-            st.session_state.summary_notes = summary.get_summary_notes(
+        st.session_state.summary_notes = summary.clean_summary_notes(stream_output(
+            "Generating summary notes...",
+            summary.get_summary_notes_stream(
                 llm=st.session_state.llm,
                 provider=st.session_state.provider,
                 evaluation_report=st.session_state.evaluation_report,
                 qna=st.session_state.qa_pairs,
                 analysis=st.session_state.gap_analysis,
                 doc_result=st.session_state.doc_result,
-                trans_result=st.session_state.trans_result 
+                trans_result=st.session_state.trans_result,
+                doc_index=st.session_state.get('doc_index'),
+                token_budget=st.session_state.get('context_budget')
             )
+        ))
     if 'summary_notes' in st.session_state:
         with st.expander("View Summary Notes", expanded=False):
             st.markdown(st.session_state.summary_notes)
@@ -122,16 +176,22 @@ def learning_material():
     # --- Supplementary Questions Section ---
     st.subheader("❓ Supplementary Questions")
     if st.button("Generate Supplementary Questions", key="supp_qa_btn"):
+        # Structured output: the schema constrains every provider, which streaming cannot do
         with st.spinner("Generating supplementary questions..."):
-            st.session_state.qs_pairs = ex_questions.supplementary_qa_gen(
-                llm=st.session_state.llm,
-                provider=st.session_state.provider,
-                evaluation_report=st.session_state.evaluation_report,
-                qna=st.session_state.qa_pairs,
-                analysis=st.session_state.gap_analysis,
-                doc_result=st.session_state.doc_result,
-                trans_result=st.session_state.trans_result
-            )
+            try:
+                st.session_state.qs_pairs = ex_questions.supplementary_qa_gen(
+                    llm=st.session_state.llm,
+                    provider=st.session_state.provider,
+                    evaluation_report=st.session_state.evaluation_report,
+                    qna=st.session_state.qa_pairs,
+                    analysis=st.session_state.gap_analysis,
+                    doc_result=st.session_state.doc_result,
+                    trans_result=st.session_state.trans_result,
+                    doc_index=st.session_state.get('doc_index'),
+                    token_budget=st.session_state.get('context_budget')
+                )
+            except ValueError as e:
+                st.error(f"❌ Could not generate supplementary questions: {e}")
     if 'qs_pairs' in st.session_state:
         with st.expander("Practice Questions", expanded=False):
             for i, pair in enumerate(st.session_state.qs_pairs):
@@ -150,16 +210,20 @@ def learning_material():
     # --- Key Vocabulary Section ---
     st.subheader("📚 Key Vocabulary")
     if st.button("Generate Key Vocabulary", key="vocab_btn"):
-        with st.spinner("Generating key vocabulary..."):
-            st.session_state.vocab = key_vocab.get_key_vocab(
+        st.session_state.vocab = key_vocab.format_key_vocab(stream_output(
+            "Generating key vocabulary...",
+            key_vocab.get_key_vocab_stream(
                 llm=st.session_state.llm,
                 provider=st.session_state.provider,
                 evaluation_report=st.session_state.evaluation_report,
                 qna=st.session_state.qa_pairs,
                 analysis=st.session_state.gap_analysis,
                 doc_result=st.session_state.doc_result,
-                trans_result=st.session_state.trans_result
+                trans_result=st.session_state.trans_result,
+                doc_index=st.session_state.get('doc_index'),
+                token_budget=st.session_state.get('context_budget')
             )
+        ))
     if 'vocab' in st.session_state:
         with st.expander("Important Terms and Concepts", expanded=False):
             st.markdown(st.session_state.vocab)